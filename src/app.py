@@ -1,8 +1,51 @@
-from flask import Flask, request, jsonify, render_template_string
+import os
+import threading
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context, url_for
 from bug_detector.bug_predictor import BugPredictor
+from bug_detector.clients import load_environment
+from bug_detector.coalescing import SingleFlight
+from bug_detector.jobs import JobQueue, QueueFullError, SlotPool
+from bug_detector.streaming import format_sse
+
+# The job queue settings below may come from .env
+load_environment()
 
 app = Flask(__name__)
-predictor = BugPredictor()
+inflight = SingleFlight()
+
+# Built on the first request (or by warm_up) so importing the app stays cheap
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+class PredictorUnavailableError(Exception):
+    """
+    Raised when the predictor cannot be built, e.g. because no API key is configured.
+    """
+
+
+def get_predictor() -> BugPredictor:
+    """
+    Return the shared BugPredictor, creating it on first use.
+    """
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                try:
+                    _predictor = BugPredictor()
+                except ValueError as e:
+                    raise PredictorUnavailableError(str(e)) from e
+    return _predictor
+
+
+def warm_up():
+    """
+    Build the predictor and import the model SDK ahead of the first request.
+    Call it from a pre-fork server's master process (or set BUG_DETECTOR_WARM_UP=1)
+    so workers start with everything already imported.
+    """
+    get_predictor().gemini.backends.warm_up()
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -381,94 +424,218 @@ function example() {
     </div>
 
     <script>
-        document.getElementById('bugForm').addEventListener('submit', function(e) {
-            e.preventDefault();
+        function pollJob(statusUrl) {
+            return fetch(statusUrl)
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'done') {
+                        return job.result;
+                    }
+                    if (job.status === 'failed' || job.error) {
+                        return {error: job.error};
+                    }
+                    return new Promise(resolve => setTimeout(resolve, 1000)).then(() => pollJob(statusUrl));
+                });
+        }
+
+        function scoresHtml(data) {
+            let html = '';
+
+            // Create score boxes
+            html += '<div class="score-container">';
+            html += '<div class="score-box">';
+            html += '<div class="score-value">' + (data.code_quality_score || 0) + '</div>';
+            html += '<div class="score-label">Code Quality</div>';
+            html += '</div>';
+
+            html += '<div class="score-box">';
+            html += '<div class="score-value">' + (data.security_score || 0) + '</div>';
+            html += '<div class="score-label">Security</div>';
+            html += '</div>';
+
+            html += '<div class="score-box">';
+            html += '<div class="score-value">' + (data.performance_score || 0) + '</div>';
+            html += '<div class="score-label">Performance</div>';
+            html += '</div>';
+
+            html += '</div>';
+            return html;
+        }
+
+        function issueHtml(issue) {
+            let html = '<div class="issue-item">';
+            html += '<div class="issue-type">' + issue.type + ' (Line ' + (issue.line_number || 'N/A') + ')</div>';
+            html += '<div class="issue-description">' + issue.description + '</div>';
+            html += '<div class="issue-suggestion">💡 Suggestion: ' + issue.suggestion + '</div>';
+
+            // Add additional context from Serper if available
+            if (issue.additional_context) {
+                html += '<div class="issue-external-context" style="margin-top: 10px; padding: 10px; background: #e6f7ff; border-radius: 6px; border-left: 3px solid #1890ff;">';
+                html += '<strong>📚 Additional Info:</strong><br>';
+                html += '<a href="' + issue.additional_context.link + '" target="_blank" style="color: #1890ff; text-decoration: none;">';
+                html += issue.additional_context.title + '</a><br>';
+                html += '<small style="color: #666;">' + issue.additional_context.snippet + '</small>';
+                html += '</div>';
+            }
 
-            const code = document.getElementById('code').value;
-            const submitBtn = document.getElementById('submitBtn');
-            const resultDiv = document.getElementById('result');
-            const resultContent = document.getElementById('result-content');
+            html += '</div>';
+            return html;
+        }
 
-            if (!code.trim()) {
-                alert('Please enter some code to analyze.');
+        function noIssuesHtml() {
+            let html = '<div class="no-issues">';
+            html += '<p class="no-issues-text">🎉 No issues detected! Your code looks great.</p>';
+            html += '</div>';
+            return html;
+        }
+
+        function renderResult(resultContent, data) {
+            if (data.error) {
+                resultContent.innerHTML = '<div class="error">❌ Error: ' + data.error + '</div>';
                 return;
             }
 
-            // Show processing message and disable button
-            resultContent.innerHTML = '<p class="processing">🔍 Analyzing your code... Please wait while our AI examines your code for potential bugs.</p>';
-            resultDiv.style.display = 'block';
-            submitBtn.disabled = true;
-            submitBtn.textContent = '🔍 Analyzing...';
-            submitBtn.classList.add('btn-analyzing');
+            let html = scoresHtml(data);
 
-            fetch('/analyze', {
+            // Show issues if any
+            if (data.issues && data.issues.length > 0) {
+                html += '<h4 class="issues-header">⚠️ Issues Found (' + data.issues.length + ')</h4>';
+                html += '<div class="issues-container">';
+                data.issues.forEach(issue => {
+                    html += issueHtml(issue);
+                });
+                html += '</div>';
+            } else {
+                html += noIssuesHtml();
+            }
+
+            resultContent.innerHTML = html;
+        }
+
+        function analyzeWithJobs(code, resultContent) {
+            return fetch('/analyze/jobs', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({code: code})
             })
-            .then(response => response.json())
-            .then(data => {
-                if (data.error) {
-                    resultContent.innerHTML = '<div class="error">❌ Error: ' + data.error + '</div>';
-                    return;
+            .then(response => response.json().then(job => {
+                if (!response.ok) {
+                    return {error: job.error || ('Request failed with status ' + response.status)};
                 }
+                return pollJob(job.status_url);
+            }))
+            .then(data => renderResult(resultContent, data));
+        }
 
-                let html = '';
+        function analyzeWithStream(code, resultContent) {
+            return fetch('/analyze/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({code: code})
+            })
+            .then(response => {
+                if (response.status === 503) {
+                    // Streams are at capacity: queue the analysis instead
+                    return analyzeWithJobs(code, resultContent);
+                }
+                if (!response.ok || !response.body) {
+                    return response.json().then(data => renderResult(resultContent, {
+                        error: data.error || ('Request failed with status ' + response.status)
+                    }));
+                }
 
-                // Create score boxes
-                html += '<div class="score-container">';
-                html += '<div class="score-box">';
-                html += '<div class="score-value">' + (data.code_quality_score || 0) + '</div>';
-                html += '<div class="score-label">Code Quality</div>';
-                html += '</div>';
+                let issueCount = 0;
+                resultContent.innerHTML = '<div id="stream-scores"></div>' +
+                    '<h4 class="issues-header" id="stream-issues-header" style="display: none;"></h4>' +
+                    '<div class="issues-container" id="stream-issues"></div>' +
+                    '<p class="processing" id="stream-status">🔍 Analyzing your code... Issues appear below as soon as they are found.</p>';
+
+                function handleEvent(event, data) {
+                    const status = document.getElementById('stream-status');
+                    if (event === 'issue') {
+                        issueCount += 1;
+                        const header = document.getElementById('stream-issues-header');
+                        header.style.display = 'block';
+                        header.textContent = '⚠️ Issues Found (' + issueCount + ')';
+                        document.getElementById('stream-issues').insertAdjacentHTML('beforeend', issueHtml(data));
+                    } else if (event === 'result') {
+                        document.getElementById('stream-scores').innerHTML = scoresHtml(data);
+                        if (issueCount === 0) {
+                            document.getElementById('stream-issues').innerHTML = noIssuesHtml();
+                        }
+                        if (status) {
+                            status.remove();
+                        }
+                    } else if (event === 'error' && status) {
+                        status.outerHTML = '<div class="error">❌ Error: ' + data.error + '</div>';
+                    }
+                }
 
-                html += '<div class="score-box">';
-                html += '<div class="score-value">' + (data.security_score || 0) + '</div>';
-                html += '<div class="score-label">Security</div>';
-                html += '</div>';
+                // Parse Server-Sent Events frames as they arrive
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                function read() {
+                    return reader.read().then(chunk => {
+                        if (chunk.done) {
+                            return;
+                        }
+                        buffer += decoder.decode(chunk.value, {stream: true});
+                        let boundary = buffer.indexOf('\\n\\n');
+                        while (boundary !== -1) {
+                            const frame = buffer.slice(0, boundary);
+                            buffer = buffer.slice(boundary + 2);
+                            let event = 'message';
+                            let payload = '';
+                            frame.split('\\n').forEach(line => {
+                                if (line.startsWith('event: ')) {
+                                    event = line.slice(7);
+                                } else if (line.startsWith('data: ')) {
+                                    payload += line.slice(6);
+                                }
+                            });
+                            if (payload) {
+                                handleEvent(event, JSON.parse(payload));
+                            }
+                            boundary = buffer.indexOf('\\n\\n');
+                        }
+                        return read();
+                    });
+                }
+                return read();
+            });
+        }
 
-                html += '<div class="score-box">';
-                html += '<div class="score-value">' + (data.performance_score || 0) + '</div>';
-                html += '<div class="score-label">Performance</div>';
-                html += '</div>';
+        document.getElementById('bugForm').addEventListener('submit', function(e) {
+            e.preventDefault();
 
-                html += '</div>';
+            const code = document.getElementById('code').value;
+            const submitBtn = document.getElementById('submitBtn');
+            const resultDiv = document.getElementById('result');
+            const resultContent = document.getElementById('result-content');
 
-                // Show issues if any
-                if (data.issues && data.issues.length > 0) {
-                    html += '<h4 class="issues-header">⚠️ Issues Found (' + data.issues.length + ')</h4>';
-                    html += '<div class="issues-container">';
-
-                    data.issues.forEach(issue => {
-                        html += '<div class="issue-item">';
-                        html += '<div class="issue-type">' + issue.type + ' (Line ' + (issue.line_number || 'N/A') + ')</div>';
-                        html += '<div class="issue-description">' + issue.description + '</div>';
-                        html += '<div class="issue-suggestion">💡 Suggestion: ' + issue.suggestion + '</div>';
-
-                        // Add additional context from Serper if available
-                        if (issue.additional_context) {
-                            html += '<div class="issue-external-context" style="margin-top: 10px; padding: 10px; background: #e6f7ff; border-radius: 6px; border-left: 3px solid #1890ff;">';
-                            html += '<strong>📚 Additional Info:</strong><br>';
-                            html += '<a href="' + issue.additional_context.link + '" target="_blank" style="color: #1890ff; text-decoration: none;">';
-                            html += issue.additional_context.title + '</a><br>';
-                            html += '<small style="color: #666;">' + issue.additional_context.snippet + '</small>';
-                            html += '</div>';
-                        }
+            if (!code.trim()) {
+                alert('Please enter some code to analyze.');
+                return;
+            }
 
-                        html += '</div>';
-                    });
+            // Show processing message and disable button
+            resultContent.innerHTML = '<p class="processing">🔍 Analyzing your code... Please wait while our AI examines your code for potential bugs.</p>';
+            resultDiv.style.display = 'block';
+            submitBtn.disabled = true;
+            submitBtn.textContent = '🔍 Analyzing...';
+            submitBtn.classList.add('btn-analyzing');
 
-                    html += '</div>';
-                } else {
-                    html += '<div class="no-issues">';
-                    html += '<p class="no-issues-text">🎉 No issues detected! Your code looks great.</p>';
-                    html += '</div>';
-                }
+            // Stream results when the browser supports it, otherwise poll the job API
+            const analysis = (window.ReadableStream && window.TextDecoder)
+                ? analyzeWithStream(code, resultContent)
+                : analyzeWithJobs(code, resultContent);
 
-                resultContent.innerHTML = html;
-            })
+            analysis
             .catch(error => {
                 resultContent.innerHTML = '<div class="error">❌ Network error: ' + error + '</div>';
             })
@@ -484,6 +651,10 @@ function example() {
 </html>
 '''
 
+@app.errorhandler(PredictorUnavailableError)
+def predictor_unavailable(e):
+    return jsonify({'error': str(e)}), 503
+
 @app.route('/')
 def index():
     return render_template_string(HTML_TEMPLATE)
@@ -492,12 +663,107 @@ def index():
 def analyze():
     data = request.json
     code = data.get('code', '')
+    language = data.get('language', 'python')
     
     if not code:
         return jsonify({'error': 'No code provided'}), 400
     
-    result = predictor.predict_bugs(code)
+    result = analyze_shared(code, language)
     return jsonify(result)
 
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    data = request.json
+    code = data.get('code', '')
+    language = data.get('language', 'python')
+
+    if not code:
+        return jsonify({'error': 'No code provided'}), 400
+
+    predictor = get_predictor()
+    # Each stream holds a request thread until the model answers, so their number is capped
+    try:
+        stream_slots.acquire()
+    except QueueFullError as e:
+        return _queue_full_response(e)
+
+    def events():
+        for event, payload in predictor.stream_predict(code, language):
+            yield format_sse(event, payload)
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(stream_slots.release)
+    return response
+
+def _queue_full_response(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.route('/analyze/jobs', methods=['POST'])
+def submit_analysis_job():
+    data = request.json
+    code = data.get('code', '')
+    language = data.get('language', 'python')
+
+    if not code:
+        return jsonify({'error': 'No code provided'}), 400
+
+    try:
+        job_id = jobs.submit(code, language)
+    except QueueFullError as e:
+        return _queue_full_response(e)
+
+    status_url = url_for('get_analysis_job', job_id=job_id)
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+@app.route('/analyze/jobs/<job_id>')
+def get_analysis_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job)
+
+@app.route('/stats')
+def stats():
+    report = {
+        'coalescing': inflight.get_stats(),
+        'jobs': jobs.get_stats(),
+        'streams': stream_slots.get_stats()
+    }
+    # Reading stats should not build the predictor
+    if _predictor is not None:
+        report.update({
+            'cache': _predictor.gemini.cache.get_stats(),
+            'budget': _predictor.remaining_budget(),
+            'backends': _predictor.gemini.backends.get_stats()
+        })
+    return jsonify(report)
+
+def analyze_shared(code, language):
+    """
+    Run predict_bugs, sharing one call between concurrent identical requests.
+    """
+    predictor = get_predictor()
+    key = predictor.gemini.cache_key(code, language)
+    return inflight.do(key, lambda: predictor.predict_bugs(code, language))
+
+jobs = JobQueue(
+    analyze_shared,
+    max_workers=int(os.getenv('BUG_DETECTOR_JOB_WORKERS', '4')),
+    max_queue_depth=int(os.getenv('BUG_DETECTOR_JOB_QUEUE_DEPTH', '32')),
+    ttl_seconds=int(os.getenv('BUG_DETECTOR_JOB_TTL', '600'))
+)
+stream_slots = SlotPool(max_slots=int(os.getenv('BUG_DETECTOR_STREAM_SLOTS', '4')))
+
+if os.getenv('BUG_DETECTOR_WARM_UP', '').lower() in ('1', 'true', 'yes'):
+    warm_up()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,155 @@
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import google.generativeai as genai
+
+from bug_detector import clients
+
+DEFAULT_PAYLOAD = {
+    "has_issues": True,
+    "issues": [
+        {
+            "type": "Logic Error",
+            "description": "Division by zero when the list is empty",
+            "severity": "high",
+            "line_number": 5,
+            "suggestion": "Return early for an empty list",
+            "confidence": 85
+        }
+    ],
+    "code_quality_score": 70,
+    "security_score": 90,
+    "performance_score": 85
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+_SNIPPET_MARKER = re.compile(r"=== SNIPPET (\d+) ===")
+
+
+class FakeQuotaError(Exception):
+    """
+    Stand-in for the API's 429 response; recognized by rate_limiter.is_quota_error.
+    """
+
+
+class FakeServerError(Exception):
+    """
+    Stand-in for a non-retryable API failure.
+    """
+
+
+class FakeGeminiConfig:
+    """
+    Behaviour of the fake model: latency distribution, failure rates and the canned payload.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, latency_distribution: str = "lognormal",
+                 latency_jitter: float = 0.5, error_rate: float = 0.0, quota_rate: float = 0.0,
+                 retry_after: float = 0.05, payload: Optional[Dict] = None, stream_chunk_chars: int = 64,
+                 seed: Optional[int] = None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.retry_after = retry_after
+        self.payload = payload if payload is not None else DEFAULT_PAYLOAD
+        self.stream_chunk_chars = stream_chunk_chars
+        self.seed = seed
+
+    def to_dict(self) -> Dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "latency_distribution": self.latency_distribution,
+            "latency_jitter": self.latency_jitter,
+            "error_rate": self.error_rate,
+            "quota_rate": self.quota_rate,
+            "retry_after": self.retry_after
+        }
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel that sleeps for a sampled latency and
+    returns the canned payload, or fails at the configured rates.
+    """
+
+    config = FakeGeminiConfig()
+    _random = random.Random()
+    _random_lock = threading.Lock()
+    calls = 0
+
+    def __init__(self, model_name: str = 'gemini-2.5-flash', **kwargs):
+        self.model_name = model_name
+
+    @classmethod
+    def configure(cls, config: FakeGeminiConfig):
+        cls.config = config
+        cls._random = random.Random(config.seed)
+        cls.calls = 0
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        config = self.config
+        with self._random_lock:
+            FakeGenerativeModel.calls += 1
+            latency = self._sample_latency(config)
+            outcome = self._random.random()
+        time.sleep(latency)
+
+        if outcome < config.quota_rate:
+            raise FakeQuotaError(f"429 Resource has been exhausted (e.g. check quota). "
+                                 f"Please retry in {config.retry_after}s.")
+        if outcome < config.quota_rate + config.error_rate:
+            raise FakeServerError("500 Internal error encountered.")
+
+        text = self._response_text(str(prompt))
+        if stream:
+            size = max(1, config.stream_chunk_chars)
+            return [SimpleNamespace(text=text[i:i + size]) for i in range(0, len(text), size)]
+        return SimpleNamespace(text=text)
+
+    def _sample_latency(self, config: FakeGeminiConfig) -> float:
+        mean = config.latency_ms / 1000.0
+        if config.latency_distribution == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if config.latency_distribution == "uniform":
+            return self._random.uniform(mean * (1 - config.latency_jitter), mean * (1 + config.latency_jitter))
+        if config.latency_distribution == "normal":
+            return max(0.0, self._random.gauss(mean, mean * config.latency_jitter))
+        # Lognormal with the requested median; jitter is the shape parameter (long right tail)
+        return self._random.lognormvariate(0.0, config.latency_jitter) * mean
+
+    def _response_text(self, prompt: str) -> str:
+        snippets = _SNIPPET_MARKER.findall(prompt)
+        if snippets:
+            # Packed batch prompts expect one result per snippet
+            body = [dict(self.config.payload, snippet_index=int(index)) for index in snippets]
+        else:
+            body = self.config.payload
+        return "```json\n" + json.dumps(body, indent=2) + "\n```"
+
+
+@contextmanager
+def fake_gemini(config: Optional[FakeGeminiConfig] = None):
+    """
+    Patch google.generativeai so every model created inside the block is a FakeGenerativeModel.
+    """
+    FakeGenerativeModel.configure(config or FakeGeminiConfig())
+    original_model, original_configure = genai.GenerativeModel, genai.configure
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.configure = lambda **kwargs: None
+    clients.reset()
+    try:
+        yield FakeGenerativeModel
+    finally:
+        genai.GenerativeModel, genai.configure = original_model, original_configure
+        clients.reset()
@@ -0,0 +1,268 @@
+# Offline load tests for the bug detector against a local Gemini stand-in.
+# Run from the src directory:
+#   python -m benchmarks.run --requests 200 --concurrency 8 --output benchmark_results.json
+#   python -m benchmarks.run --baseline benchmark_results.json
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .fake_gemini import LATENCY_DISTRIBUTIONS, FakeGeminiConfig, FakeGenerativeModel, fake_gemini
+
+SCENARIOS = ("flask_analyze", "predict_bugs", "batch_predict", "predict_bugs_in_file")
+
+SNIPPET = '''def accumulate_{name}(values, factor):
+    total = 0
+    for value in values:
+        if value is None:
+            continue
+        total += value * factor
+    return total
+'''
+
+
+def _configure_environment():
+    # Real quota, the on-disk cache and the API key must not affect the measurements
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    os.environ['BUG_DETECTOR_CACHE_DB'] = ''
+    os.environ['GEMINI_REQUESTS_PER_MINUTE'] = str(10 ** 9)
+    os.environ['GEMINI_REQUESTS_PER_DAY'] = str(10 ** 9)
+
+
+def _snippet(run_id: str, index: int) -> str:
+    # Unique code per request so the result cache and request coalescing never short-circuit
+    return SNIPPET.format(name=f"{run_id}_{index}")
+
+
+def _is_error(result) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(_is_error(item) for item in result)
+    return False
+
+
+def _setup_flask(args, run_id: str) -> Tuple[Callable[[int], bool], int, int]:
+    import app as web
+
+    local = threading.local()
+
+    def operation(index):
+        if not hasattr(local, "client"):
+            local.client = web.app.test_client()
+        response = local.client.post('/analyze', json={"code": _snippet(run_id, index), "language": "python"})
+        return response.status_code != 200 or _is_error(response.get_json())
+
+    return operation, 1, args.concurrency
+
+
+def _setup_predict(args, run_id: str) -> Tuple[Callable[[int], bool], int, int]:
+    from bug_detector.bug_predictor import BugPredictor
+
+    predictor = BugPredictor()
+    return lambda index: _is_error(predictor.predict_bugs(_snippet(run_id, index))), 1, args.concurrency
+
+
+def _setup_batch(args, run_id: str) -> Tuple[Callable[[int], bool], int, int]:
+    from bug_detector.bug_predictor import BugPredictor
+
+    predictor = BugPredictor()
+
+    def operation(index):
+        snippets = [_snippet(run_id, index * args.batch_size + i) for i in range(args.batch_size)]
+        return _is_error(predictor.batch_predict(snippets, max_workers=args.concurrency))
+
+    # batch_predict parallelizes internally, so batches themselves run one at a time
+    return operation, args.batch_size, 1
+
+
+def _setup_file(args, run_id: str) -> Tuple[Callable[[int], bool], int, int]:
+    from main import BugDetector
+
+    detector = BugDetector()
+    directory = tempfile.mkdtemp(prefix="bug_detector_bench_")
+
+    def operation(index):
+        path = os.path.join(directory, f"module_{index}.py")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("\n\n".join(_snippet(f"{run_id}_{index}", i) for i in range(args.file_functions)))
+        try:
+            return _is_error(detector.predict_bugs_in_file(path, max_tokens=args.file_chunk_tokens,
+                                                           max_workers=args.concurrency))
+        finally:
+            os.remove(path)
+
+    return operation, args.file_functions, 1
+
+
+SETUP = {
+    "flask_analyze": _setup_flask,
+    "predict_bugs": _setup_predict,
+    "batch_predict": _setup_batch,
+    "predict_bugs_in_file": _setup_file,
+}
+
+
+def run_scenario(name: str, args, run_id: str) -> Dict:
+    """
+    Run one scenario and return its throughput, latency percentiles and memory use.
+    Timing runs without tracemalloc, which slows every allocation; peak memory is measured
+    in a separate pass over fresh snippets so the result cache does not hide allocations.
+    """
+    operation, items_per_operation, concurrency = SETUP[name](args, run_id)
+    operations = max(1, args.requests // items_per_operation)
+    memory_operations = 0
+    if args.memory_requests > 0:
+        memory_operations = max(1, min(operations, args.memory_requests // items_per_operation))
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            failed = operation(index)
+        except Exception:
+            failed = True
+        return time.perf_counter() - started, failed
+
+    calls_before = FakeGenerativeModel.calls
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(operations)))
+    elapsed = time.perf_counter() - started
+    model_calls = FakeGenerativeModel.calls - calls_before
+
+    peak = None
+    if memory_operations:
+        tracemalloc.start()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(timed, range(operations, operations + memory_operations)))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    latencies = np.array([latency for latency, _ in outcomes]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "operations": operations,
+        "items": operations * items_per_operation,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, failed in outcomes if failed),
+        "elapsed_s": elapsed,
+        "throughput_items_per_s": operations * items_per_operation / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(latencies.max())
+        },
+        "model_calls": model_calls,
+        "peak_memory_kb": peak / 1024 if peak is not None else None
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Return a description of every scenario whose throughput or p95 latency regressed
+    by more than tolerance relative to the baseline run.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        throughput = current["throughput_items_per_s"] / max(previous["throughput_items_per_s"], 1e-9)
+        p95 = current["latency_ms"]["p95"] / max(previous["latency_ms"]["p95"], 1e-9)
+        print(f"{name:<22} throughput x{throughput:.2f}  p95 x{p95:.2f}")
+        if throughput < 1 - tolerance or p95 > 1 + tolerance:
+            regressions.append(f"{name}: throughput x{throughput:.2f}, p95 x{p95:.2f}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline load tests with a fake Gemini backend")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=200, help="Snippets analyzed per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests or worker threads")
+    parser.add_argument("--batch-size", type=int, default=20, help="Snippets per batch_predict call")
+    parser.add_argument("--file-functions", type=int, default=40, help="Functions per generated file")
+    parser.add_argument("--file-chunk-tokens", type=int, default=200, help="max_tokens for predict_bugs_in_file")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median fake model latency")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-jitter", type=float, default=0.5,
+                        help="Relative spread (lognormal shape, normal sigma, uniform half-width)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with a 500")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="Fraction of calls failing with a 429")
+    parser.add_argument("--payload", help="JSON file with the canned analysis payload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-requests", type=int, default=50,
+                        help="Snippets analyzed in the separate traced pass for peak memory (0 to skip)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression before exiting with status 1")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    _configure_environment()
+
+    payload = None
+    if args.payload:
+        with open(args.payload, 'r', encoding='utf-8') as file:
+            payload = json.load(file)
+    config = FakeGeminiConfig(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        quota_rate=args.quota_rate,
+        payload=payload,
+        seed=args.seed
+    )
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "fake_model": config.to_dict(),
+        "requests": args.requests,
+        "scenarios": {}
+    }
+    run_id = uuid.uuid4().hex[:8]
+    with fake_gemini(config):
+        for name in args.scenario or SCENARIOS:
+            results["scenarios"][name] = report = run_scenario(name, args, run_id)
+            latency = report["latency_ms"]
+            peak = f"{report['peak_memory_kb']:8.0f} KiB" if report['peak_memory_kb'] is not None else "       -    "
+            print(f"{name:<22} {report['throughput_items_per_s']:8.1f} items/s  "
+                  f"p50 {latency['p50']:7.1f} ms  p95 {latency['p95']:7.1f} ms  p99 {latency['p99']:7.1f} ms  "
+                  f"peak {peak}  errors {report['errors']}")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
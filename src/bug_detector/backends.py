@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Union
+
+from . import clients
+from .rate_limiter import RateLimiter, call_with_retry, default_rate_limiter, is_quota_error, model_rate_limiter
+
+
+class ModelBackend:
+    """
+    Interface for anything that turns a prompt into a response with a .text attribute.
+    With stream=True the response is an iterable of chunks that each have .text.
+    """
+
+    name = "backend"
+
+    def generate(self, prompt: str, **kwargs):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """
+        Do any expensive one-time setup now instead of on the first request.
+        """
+
+
+class GeminiBackend(ModelBackend):
+    """
+    Backend for one Gemini model, using the process-wide shared client.
+    """
+
+    def __init__(self, model_name: str = 'gemini-2.5-flash', api_key: Optional[str] = None):
+        clients.load_environment()
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        self.name = model_name
+
+    @property
+    def model(self):
+        # Resolved on first use so constructing a backend does not import the SDK
+        return clients.get_model(self.name, self.api_key)
+
+    def generate(self, prompt: str, **kwargs):
+        return self.model.generate_content(prompt, **kwargs)
+
+    def warm_up(self):
+        clients.get_model(self.name, self.api_key)
+
+
+class LocalBackend(ModelBackend):
+    """
+    Offline stand-in that answers every prompt with fixed text or the output of a callable.
+    Useful in tests and local development.
+    """
+
+    def __init__(self, response: Union[str, Callable[[str], str]] = '{"has_issues": false, "issues": []}',
+                 latency: float = 0.0, name: str = 'local'):
+        self.response = response
+        self.latency = latency
+        self.name = name
+
+    def generate(self, prompt: str, stream: bool = False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.response(prompt) if callable(self.response) else self.response
+        if stream:
+            return [SimpleNamespace(text=text)]
+        return SimpleNamespace(text=text)
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies of one backend.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int = 20) -> Optional[float]:
+        """
+        Return the given latency percentile, or None until enough samples were seen.
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100.0))
+        return ordered[index]
+
+
+class _Tier:
+    def __init__(self, backend: ModelBackend, rate_limiter: Optional[RateLimiter]):
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.latencies = LatencyTracker()
+
+
+class BackendRegistry:
+    """
+    Ordered model tiers with quota fallback and hedged requests.
+    A quota error (or a locally exhausted budget) on one tier moves the request to the next tier.
+    With hedge_percentile set, a second request is sent when the first has not answered
+    within that percentile of the tier's recent latencies; the first answer wins. Requests are
+    only hedged while the hedge pool has free workers, so they never queue behind each other.
+    """
+
+    def __init__(self, hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20,
+                 max_hedge_workers: int = 8):
+        self.tiers: List[_Tier] = []
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_workers = max_hedge_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_hedge_workers)
+        self._busy_workers = 0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0, "fallbacks": 0}
+
+    def add_tier(self, backend: ModelBackend, rate_limiter: Optional[RateLimiter] = None) -> "BackendRegistry":
+        """
+        Append a tier; requests try tiers in the order they were added.
+        """
+        self.tiers.append(_Tier(backend, rate_limiter))
+        return self
+
+    @property
+    def primary(self) -> ModelBackend:
+        return self.tiers[0].backend
+
+    @property
+    def primary_rate_limiter(self) -> Optional[RateLimiter]:
+        return self.tiers[0].rate_limiter
+
+    def generate(self, prompt: str, **kwargs):
+        """
+        Generate a response, falling back through the tiers on quota errors.
+        """
+        if not self.tiers:
+            raise ValueError("No model backends configured")
+        self._count("requests")
+        for index, tier in enumerate(self.tiers):
+            last = index == len(self.tiers) - 1
+            try:
+                return self._hedged(tier, prompt, kwargs, last)
+            except Exception as e:
+                if last or not is_quota_error(e):
+                    raise
+                self._count("fallbacks")
+
+    def warm_up(self):
+        """
+        Import SDKs and build model clients for every tier ahead of the first request.
+        """
+        for tier in self.tiers:
+            tier.backend.warm_up()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["tiers"] = [tier.backend.name for tier in self.tiers]
+        return stats
+
+    def _hedged(self, tier: _Tier, prompt: str, kwargs: Dict, last: bool):
+        delay = None
+        if self.hedge_percentile is not None and not kwargs.get('stream'):
+            delay = tier.latencies.percentile(self.hedge_percentile, self.hedge_min_samples)
+        if delay is None:
+            return self._attempt(tier, prompt, kwargs, last)
+        if not self._reserve_worker():
+            # Queuing the first attempt would only add latency: run it here, unhedged
+            self._count("hedges_skipped")
+            return self._attempt(tier, prompt, kwargs, last)
+
+        started = threading.Event()
+        first = self._executor.submit(self._reserved_attempt, started, tier, prompt, kwargs, last)
+        # The hedge delay counts from when the attempt starts running, not from when it was queued
+        started.wait()
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        if not self._reserve_worker():
+            self._count("hedges_skipped")
+            return first.result()
+
+        self._count("hedged")
+        second = self._executor.submit(self._reserved_attempt, threading.Event(), tier, prompt, kwargs, last)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    # The slower request keeps running in the background; its answer is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _reserve_worker(self) -> bool:
+        with self._lock:
+            if self._busy_workers >= self.max_hedge_workers:
+                return False
+            self._busy_workers += 1
+            return True
+
+    def _reserved_attempt(self, started: threading.Event, tier: _Tier, prompt: str, kwargs: Dict, last: bool):
+        started.set()
+        try:
+            return self._attempt(tier, prompt, kwargs, last)
+        finally:
+            with self._lock:
+                self._busy_workers -= 1
+
+    def _attempt(self, tier: _Tier, prompt: str, kwargs: Dict, last: bool):
+        started = time.monotonic()
+        call = lambda: tier.backend.generate(prompt, **kwargs)
+        if tier.rate_limiter is None:
+            response = call()
+        elif last:
+            response = call_with_retry(call, tier.rate_limiter)
+        else:
+            # Another tier can take over, so don't wait for this one's budget or retry it
+            response = call_with_retry(call, tier.rate_limiter, max_retries=0, acquire_timeout=0)
+        tier.latencies.record(time.monotonic() - started)
+        return response
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def default_registry(model_name: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None) -> BackendRegistry:
+    """
+    Build the Gemini tiers from the environment.
+    GEMINI_MODEL_TIERS lists models in fallback order (default: the given model or gemini-2.5-flash);
+    the first tier uses the shared rate limiter, later tiers get their own process-wide budgets.
+    GEMINI_HEDGE_PERCENTILE enables hedged requests (e.g. 95).
+    """
+    names = [name.strip() for name in os.getenv('GEMINI_MODEL_TIERS', '').split(',') if name.strip()]
+    if model_name:
+        names = [model_name] + [name for name in names if name != model_name]
+    names = names or ['gemini-2.5-flash']
+
+    hedge = os.getenv('GEMINI_HEDGE_PERCENTILE')
+    registry = BackendRegistry(hedge_percentile=float(hedge) if hedge else None)
+    for index, name in enumerate(names):
+        if index == 0:
+            limiter = rate_limiter if rate_limiter is not None else default_rate_limiter()
+        else:
+            limiter = model_rate_limiter(name)
+        registry.add_tier(GeminiBackend(name), limiter)
+    return registry
@@ -1,52 +1,228 @@
-from typing import Dict, List
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 from .gemini_integration import GeminiIntegration
+from .chunking import estimate_tokens
+from .prompting import render_prompt
 from .data_collector import DataCollector
+from .results import AnalysisResult
+from .rules import RuleEngine, local_result, merge_local_issues
+
+# "local_only": never call the model
+# "local_then_llm": always call the model and add local findings to its result
+# "llm_if_inconclusive": call the model only when local rules find nothing conclusive
+RULE_POLICIES = ("local_only", "local_then_llm", "llm_if_inconclusive")
+
+# Only confident findings of these severities make the model call unnecessary
+CONCLUSIVE_SEVERITIES = ("critical", "high")
+
+SUGGEST_FIX_PROMPT = """
+        The following code has an issue: {issue_description}
+
+        Code:
+        {code}
+
+        Please suggest a fix for this issue.
+        """
 
 class BugPredictor:
     """
     Main bug prediction system that uses Gemini API for code analysis.
     """
 
-    def __init__(self):
+    def __init__(self, rule_policy: Optional[str] = None, conclusive_confidence: int = 80,
+                 triage_model=None, triage_threshold: Optional[float] = None):
         self.gemini = GeminiIntegration()
         self.data_collector = DataCollector()
+        self.rule_engine = RuleEngine()
+        self.rule_policy = rule_policy or os.getenv('BUG_DETECTOR_RULE_POLICY', 'local_then_llm')
+        if self.rule_policy not in RULE_POLICIES:
+            raise ValueError(f"Unknown rule policy: {self.rule_policy}")
+        self.conclusive_confidence = conclusive_confidence
+
+        # Optional local classifier: snippets it scores below the threshold skip the model
+        model_path = os.getenv('BUG_DETECTOR_TRIAGE_MODEL')
+        if triage_model is None and model_path:
+            from .triage import TriageModel
+            triage_model = TriageModel.load(model_path)
+        self.triage_model = triage_model
+        if triage_threshold is None:
+            triage_threshold = float(os.getenv('BUG_DETECTOR_TRIAGE_THRESHOLD', '0.1'))
+        self.triage_threshold = triage_threshold
 
     def predict_bugs(self, code: str, language: str = "python") -> Dict:
         """
         Predict potential bugs in the given code.
+        Local rules run first; the rule policy decides whether the model is called as well.
         """
+        local_issues, needs_model = self._local_pass(code, language)
+        if not needs_model:
+            return local_result(local_issues)
+        probability = self._triage_probability(code)
+        if probability is not None and probability < self.triage_threshold:
+            return dict(local_result(local_issues), triage_probability=probability)
+
         result = self.gemini.analyze_code_for_bugs(code, language)
+        if local_issues:
+            result = merge_local_issues(result, local_issues)
         return result
 
-    def suggest_fix(self, code: str, issue_description: str) -> str:
+    def stream_predict(self, code: str, language: str = "python") -> Iterator[Tuple[str, Dict]]:
         """
-        Suggest a fix for a specific issue in the code.
+        Predict bugs, yielding ("issue", issue) events as they are found and a final
+        ("result", result) or ("error", result) event with the complete analysis.
+        Local rule findings are emitted first, before the model is called.
         """
-        prompt = f"""
-        The following code has an issue: {issue_description}
+        local_issues, needs_model = self._local_pass(code, language)
+        for issue in local_issues:
+            yield "issue", issue
+        if not needs_model:
+            yield "result", local_result(local_issues)
+            return
+        probability = self._triage_probability(code)
+        if probability is not None and probability < self.triage_threshold:
+            yield "result", dict(local_result(local_issues), triage_probability=probability)
+            return
 
-        Code:
-        {code}
+        local_keys = {(issue["type"], issue["line_number"]) for issue in local_issues}
+        for event, data in self.gemini.stream_analysis(code, language):
+            if event == "issue":
+                key = (str(data.get("type", "")).lower().replace(" ", "_"), data.get("line_number"))
+                if key not in local_keys:
+                    yield event, data
+            else:
+                yield event, merge_local_issues(data, local_issues) if local_issues else data
 
-        Please suggest a fix for this issue.
+    def _local_pass(self, code: str, language: str) -> Tuple[List[Dict], bool]:
+        """
+        Run the local rules and decide whether the model still has to be called.
+        """
+        issues = self.rule_engine.analyze(code) if language == "python" else None
+        if issues is None:
+            return [], self.rule_policy != "local_only"
+        if self.rule_policy == "local_only":
+            return issues, False
+        if self.rule_policy == "llm_if_inconclusive":
+            conclusive = any(
+                issue["severity"] in CONCLUSIVE_SEVERITIES and issue["confidence"] >= self.conclusive_confidence
+                for issue in issues
+            )
+            return issues, not conclusive
+        return issues, True
+
+    def _triage_probability(self, code: str) -> Optional[float]:
         """
+        Return the triage model's probability that the code has issues, or None without a model.
+        """
+        if self.triage_model is None:
+            return None
+        return self.triage_model.probability(code)
+
+    def _risk_order(self, code_list: List[str]) -> List[int]:
+        """
+        Return snippet indices ordered by descending predicted risk (input order without a model).
+        """
+        if self.triage_model is None or not code_list:
+            return list(range(len(code_list)))
+        probabilities = self.triage_model.predict_proba(code_list)
+        return sorted(range(len(code_list)), key=lambda i: -probabilities[i])
+
+    def suggest_fix(self, code: str, issue_description: str, language: str = "python") -> str:
+        """
+        Suggest a fix for a specific issue in the code.
+        The code is compacted and, if needed, truncated to the prompt budget.
+        """
+        prompts = self.gemini.prompts
+        overhead = render_prompt(SUGGEST_FIX_PROMPT, issue_description=issue_description, code="")
+        prompt = render_prompt(
+            SUGGEST_FIX_PROMPT,
+            issue_description=issue_description,
+            code=prompts.fit(code, language, max(1, prompts.max_tokens - estimate_tokens(overhead)))
+        )
 
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=self.gemini.api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(prompt)
+            response = self.gemini.generate(prompt)
             return response.text
         except Exception as e:
             return f"Error suggesting fix: {str(e)}"
 
-    def batch_predict(self, code_list: List[str]) -> List[Dict]:
+    def remaining_budget(self) -> Dict:
+        """
+        Return the requests still available before the local quota is exhausted.
+        """
+        return self.gemini.remaining_budget()
+
+    def batch_predict(self, code_list: List[str], language: str = "python",
+                      max_workers: int = 1, pack: bool = False,
+                      pack_max_chars: int = 12000, typed: bool = False) -> List:
         """
         Predict bugs for a list of code snippets.
+        With max_workers > 1 the snippets are analyzed concurrently; results keep the input order.
+        With pack=True small snippets share a single prompt of at most pack_max_chars characters.
+        With typed=True results are returned as compact AnalysisResult objects instead of dicts.
+        With a triage model the riskiest snippets are analyzed first.
+        """
+        if typed:
+            results = self.batch_predict(code_list, language, max_workers, pack, pack_max_chars)
+            return [AnalysisResult.from_dict(result) for result in results]
+
+        if pack:
+            local = [self._local_pass(code, language) for code in code_list]
+            remote = [i for i, (_, needs_model) in enumerate(local) if needs_model]
+            if self.triage_model is not None and remote:
+                probabilities = self.triage_model.predict_proba([code_list[i] for i in remote])
+                remote = [i for i, probability in zip(remote, probabilities)
+                          if probability >= self.triage_threshold]
+            remote_results = self.gemini.analyze_code_batch(
+                [code_list[i] for i in remote], language, pack_max_chars, max_workers
+            )
+            results = [local_result(issues) for issues, _ in local]
+            for i, result in zip(remote, remote_results):
+                issues = local[i][0]
+                results[i] = merge_local_issues(result, issues) if issues else result
+            return [dict(result, code_index=i) for i, result in enumerate(results)]
+
+        results = [None] * len(code_list)
+        if max_workers <= 1:
+            for i in self._risk_order(code_list):
+                results[i] = self._predict_indexed(i, code_list[i], language)
+            return results
+
+        for result in self.iter_batch_predict(code_list, language, max_workers):
+            results[result['code_index']] = result
+        return results
+
+    def iter_batch_predict(self, code_list: List[str], language: str = "python",
+                           max_workers: int = 4) -> Iterator[Dict]:
+        """
+        Predict bugs for a list of code snippets, yielding each result as soon as it finishes.
+        Results arrive in completion order; use 'code_index' to map them back to the input.
+        With a triage model the riskiest snippets are submitted first.
         """
-        results = []
-        for i, code in enumerate(code_list):
-            result = self.predict_bugs(code)
-            result['code_index'] = i
-            results.append(result)
-        return results
\ No newline at end of file
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(self._predict_indexed, i, code_list[i], language)
+                for i in self._risk_order(code_list)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Drop queued work if the caller stops consuming early
+                for future in futures:
+                    future.cancel()
+
+    def _predict_indexed(self, index: int, code: str, language: str) -> Dict:
+        try:
+            result = dict(self.predict_bugs(code, language))
+        except Exception as e:
+            result = {
+                "error": f"Error predicting bugs: {str(e)}",
+                "has_issues": False,
+                "issues": [],
+                "code_quality_score": 0,
+                "security_score": 0,
+                "performance_score": 0
+            }
+        result['code_index'] = index
+        return result
\ No newline at end of file
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ResultCache:
+    """
+    Two-tier cache for analysis results: a bounded in-process LRU in front of
+    a persistent SQLite store.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_memory_entries: int = 256,
+                 max_disk_entries: int = 10000, ttl_seconds: int = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached result, checking memory first and then disk.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._conn.execute(
+                            "UPDATE results SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._conn.commit()
+                        self._remember(key, created_at, value)
+                        self.stats["disk_hits"] += 1
+                        return json.loads(value)
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, result: Dict):
+        """
+        Store a result in both tiers.
+        """
+        now = time.time()
+        value = json.dumps(result)
+        with self._lock:
+            self._remember(key, now, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._evict_disk(now)
+                self._conn.commit()
+            self.stats["stores"] += 1
+
+    def clear(self):
+        """
+        Remove every entry from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        Return hit/miss counters and current tier sizes.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._conn is not None:
+                stats["disk_entries"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM results"
+                ).fetchone()[0]
+            else:
+                stats["disk_entries"] = 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups > 0 else 0.0
+        return stats
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        self._conn.execute(
+            "DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.stats["evictions"] += overflow
+
+
+def default_cache() -> ResultCache:
+    """
+    Build the cache configured through environment variables.
+    """
+    db_path = os.getenv('BUG_DETECTOR_CACHE_DB', '.bug_detector_cache.db')
+    return ResultCache(
+        db_path=db_path or None,
+        max_memory_entries=int(os.getenv('BUG_DETECTOR_CACHE_MEMORY_ENTRIES', '256')),
+        max_disk_entries=int(os.getenv('BUG_DETECTOR_CACHE_DISK_ENTRIES', '10000')),
+        ttl_seconds=int(os.getenv('BUG_DETECTOR_CACHE_TTL', str(7 * 24 * 3600)))
+    )
@@ -0,0 +1,159 @@
+import ast
+import os
+from typing import List
+
+LANGUAGE_BY_EXTENSION = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.c': 'c',
+    '.h': 'c',
+    '.cpp': 'cpp',
+    '.hpp': 'cpp',
+    '.cs': 'csharp',
+    '.go': 'go',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.rs': 'rust',
+    '.kt': 'kotlin',
+    '.swift': 'swift',
+}
+
+
+class Chunk:
+    """
+    A contiguous range of source lines (1-based, inclusive).
+    """
+
+    __slots__ = ('start_line', 'end_line', 'text')
+
+    def __init__(self, start_line: int, end_line: int, text: str):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+
+    def __repr__(self):
+        return f"Chunk(start_line={self.start_line}, end_line={self.end_line})"
+
+    def strip_leading_blank_lines(self) -> 'Chunk':
+        """
+        Return the chunk without its leading blank lines, with start_line moved to the first
+        non-blank line so that line numbers reported for the text map back to the file.
+        """
+        blank = leading_blank_lines(self.text)
+        if not blank or blank >= self.end_line - self.start_line + 1:
+            return self
+        lines = self.text.splitlines(keepends=True)
+        return Chunk(self.start_line + blank, self.end_line, ''.join(lines[blank:]))
+
+
+def detect_language(file_path: str) -> str:
+    """
+    Guess the language of a file from its extension.
+    """
+    return LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1].lower(), 'text')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of model tokens in a piece of text (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def leading_blank_lines(text: str) -> int:
+    """
+    Count the blank lines at the start of a piece of text.
+    """
+    count = 0
+    for line in text.splitlines():
+        if line.strip():
+            break
+        count += 1
+    return count
+
+
+def split_definitions(code: str, language: str = "python") -> List[Chunk]:
+    """
+    Split source into contiguous segments at top-level function and class boundaries.
+    Consecutive top-level statements that are not definitions share one segment, and comments
+    or blank lines before a definition belong to it. Returns an empty list when the code cannot
+    be split this way (non-Python source or a syntax error).
+    """
+    if language != "python":
+        return []
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    ranges = []
+    previous_end = 0
+    previous_is_definition = True
+    for node in tree.body:
+        is_definition = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        end = node.end_lineno
+        if ranges and not is_definition and not previous_is_definition:
+            ranges[-1][1] = end
+        else:
+            ranges.append([previous_end + 1, end])
+        previous_end = end
+        previous_is_definition = is_definition
+
+    if not ranges:
+        return [Chunk(1, len(lines), code)]
+    ranges[-1][1] = len(lines)
+    return [Chunk(start, end, ''.join(lines[start - 1:end])) for start, end in ranges]
+
+
+def line_windows(code: str, max_tokens: int, first_line: int = 1) -> List[Chunk]:
+    """
+    Split source into consecutive line windows that each fit within max_tokens.
+    """
+    chunks = []
+    window = []
+    window_tokens = 0
+    start = first_line
+    for offset, line in enumerate(code.splitlines(keepends=True)):
+        tokens = estimate_tokens(line)
+        if window and window_tokens + tokens > max_tokens:
+            chunks.append(Chunk(start, start + len(window) - 1, ''.join(window)))
+            start = first_line + offset
+            window = []
+            window_tokens = 0
+        window.append(line)
+        window_tokens += tokens
+    if window:
+        chunks.append(Chunk(start, start + len(window) - 1, ''.join(window)))
+    return chunks
+
+
+def chunk_source(code: str, language: str = "python", max_tokens: int = 2000) -> List[Chunk]:
+    """
+    Split source into chunks of at most max_tokens, cutting at definition boundaries where possible
+    and packing adjacent small segments together.
+    """
+    segments = split_definitions(code, language) or line_windows(code, max_tokens)
+
+    pieces = []
+    for segment in segments:
+        if estimate_tokens(segment.text) > max_tokens:
+            pieces.extend(line_windows(segment.text, max_tokens, segment.start_line))
+        else:
+            pieces.append(segment)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and estimate_tokens(chunks[-1].text) + estimate_tokens(piece.text) <= max_tokens:
+            last = chunks[-1]
+            chunks[-1] = Chunk(last.start_line, piece.end_line, last.text + piece.text)
+        else:
+            chunks.append(piece)
+    return chunks
@@ -0,0 +1,66 @@
+import os
+import threading
+from typing import Dict, Optional
+
+# Process-wide Gemini clients: the library is configured once and each model is built once,
+# so every caller shares the same underlying connections. The SDK itself is only imported on
+# first use because it dominates start-up time.
+_lock = threading.Lock()
+_configured_key = None
+_models: Dict[str, object] = {}
+_environment_loaded = False
+
+
+def load_environment():
+    """
+    Load variables from .env once, before any configuration is read.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+
+def _library():
+    import google.generativeai as genai
+    return genai
+
+
+def configure(api_key: Optional[str] = None):
+    """
+    Configure the Gemini library once per API key.
+    """
+    global _configured_key
+    load_environment()
+    api_key = api_key or os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    with _lock:
+        if api_key != _configured_key:
+            _library().configure(api_key=api_key)
+            _configured_key = api_key
+            # Models built with the old key hold clients bound to it
+            _models.clear()
+
+
+def get_model(model_name: str = 'gemini-2.5-flash', api_key: Optional[str] = None):
+    """
+    Return the shared GenerativeModel for model_name, creating it on first use.
+    """
+    configure(api_key)
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = _library().GenerativeModel(model_name)
+        return model
+
+
+def reset():
+    """
+    Drop all cached clients, e.g. after the library has been patched in tests or benchmarks.
+    """
+    global _configured_key
+    with _lock:
+        _configured_key = None
+        _models.clear()
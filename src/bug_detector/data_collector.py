@@ -1,7 +1,7 @@
 import os
 import json
-import requests
-from typing import List, Dict, Tuple
+import codecs
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 class DataCollector:
     """
@@ -47,6 +47,122 @@ class DataCollector:
             print(f"Invalid JSON in dataset file: {file_path}")
             return []
     
+    def iter_local_dataset(self, file_path: str, language: Optional[str] = None,
+                           bug_type: Optional[str] = None, start: int = 0,
+                           end: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Lazily yield records from a JSONL file or a JSON array file, optionally filtered by
+        language and bug_type. Only records whose first byte lies in [start, end) are yielded,
+        so several processes can split one file with shard_ranges(). Only JSONL shards cheaply:
+        every shard of a JSON array decodes the array from its start (see convert_to_jsonl).
+        """
+        try:
+            with open(file_path, 'rb') as file:
+                first = file.read(64).lstrip()[:1]
+                file.seek(0)
+                if first == b'[':
+                    records = self._iter_json_array(file, start, end)
+                else:
+                    records = self._iter_jsonl(file, start, end)
+                for record in records:
+                    if language is not None and record.get('language') != language:
+                        continue
+                    if bug_type is not None and record.get('bug_type') != bug_type:
+                        continue
+                    yield record
+        except FileNotFoundError:
+            print(f"Dataset file not found: {file_path}")
+        except json.JSONDecodeError:
+            print(f"Invalid JSON in dataset file: {file_path}")
+
+    def shard_ranges(self, file_path: str, num_shards: int) -> List[Tuple[int, int]]:
+        """
+        Split a dataset file into num_shards byte ranges for iter_local_dataset(start=, end=).
+        Sharding a JSON array saves no decoding work, so convert it with convert_to_jsonl first.
+        """
+        size = os.path.getsize(file_path)
+        return [(i * size // num_shards, (i + 1) * size // num_shards) for i in range(num_shards)]
+
+    def convert_to_jsonl(self, file_path: str, output_path: str) -> int:
+        """
+        Rewrite a JSON array (or JSONL) dataset as JSONL so it can be sharded cheaply.
+        Returns the number of records written.
+        """
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as output:
+            for record in self.iter_local_dataset(file_path):
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    def _iter_jsonl(self, file, start: int, end: Optional[int]) -> Iterator[Dict]:
+        if start > 0:
+            # Skip the line that straddles the shard boundary; the previous shard owns it
+            file.seek(start - 1)
+            file.readline()
+        while True:
+            if end is not None and file.tell() >= end:
+                break
+            line = file.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+    def _iter_json_array(self, file, start: int, end: Optional[int],
+                         chunk_size: int = 1 << 20) -> Iterator[Dict]:
+        # Elements are decoded one at a time from a sliding text buffer while tracking their
+        # byte offsets. A JSON array has no record delimiters to seek to, so every shard scans
+        # from the beginning and yields only the elements that start inside its range: N shards
+        # cost N decodes of everything before them. A byte scanner that skips the prefix without
+        # decoding is no faster than the C decoder, so large arrays should be converted to JSONL.
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        json_decoder = json.JSONDecoder()
+        buffer = ''
+        index = 0
+        offset = 0
+        eof = False
+        opened = False
+
+        while True:
+            # Separators and brackets are ASCII, so each character is one byte
+            while index < len(buffer) and buffer[index] in ' \t\r\n,':
+                index += 1
+                offset += 1
+            if index < len(buffer):
+                if not opened:
+                    if buffer[index] != '[':
+                        raise json.JSONDecodeError("Expecting '['", buffer, index)
+                    opened = True
+                    index += 1
+                    offset += 1
+                    continue
+                if buffer[index] == ']':
+                    return
+                try:
+                    record, record_end = json_decoder.raw_decode(buffer, index)
+                    # A value that runs to the end of the buffer may still be cut off
+                    decoded = record_end < len(buffer) or eof
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    decoded = False
+                if decoded:
+                    if end is not None and offset >= end:
+                        return
+                    if offset >= start and isinstance(record, dict):
+                        yield record
+                    offset += len(buffer[index:record_end].encode('utf-8'))
+                    index = record_end
+                    continue
+            elif eof:
+                return
+
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[index:] + decoder.decode(chunk, final=eof)
+            index = 0
+
     def preprocess_code(self, code: str) -> str:
         """
         Preprocess code for analysis.
@@ -55,15 +171,62 @@ class DataCollector:
         lines = [line.strip() for line in code.split('\n') if line.strip()]
         return '\n'.join(lines)
     
-    def get_training_data(self) -> Tuple[List[str], List[str]]:
+    def iter_training_data(self, records: Optional[Iterable[Dict]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily yield preprocessed (buggy code, fixed code) pairs from records, or from self.datasets.
+        """
+        for item in records if records is not None else self.datasets:
+            yield self.preprocess_code(item['buggy_code']), self.preprocess_code(item['fixed_code'])
+
+    def get_training_data(self, records: Optional[Iterable[Dict]] = None) -> Tuple[List[str], List[str]]:
         """
         Get preprocessed training data (buggy code, fixed code).
+        Records can be any iterable, e.g. iter_local_dataset(), instead of self.datasets.
         """
         buggy_codes = []
         fixed_codes = []
         
-        for item in self.datasets:
-            buggy_codes.append(self.preprocess_code(item['buggy_code']))
-            fixed_codes.append(self.preprocess_code(item['fixed_code']))
+        for buggy_code, fixed_code in self.iter_training_data(records):
+            buggy_codes.append(buggy_code)
+            fixed_codes.append(fixed_code)
         
-        return buggy_codes, fixed_codes
\ No newline at end of file
+        return buggy_codes, fixed_codes
+
+    def build_dataset_store(self, path: str, records: Optional[Iterable[Dict]] = None,
+                            max_workers: Optional[int] = None):
+        """
+        Preprocess records (or self.datasets) in parallel into a memory-mapped columnar store.
+        """
+        from .dataset_store import build_dataset_store
+        return build_dataset_store(records if records is not None else self.datasets, path, max_workers)
+
+    def open_dataset_store(self, path: str):
+        """
+        Open a store written by build_dataset_store without loading it into memory.
+        """
+        from .dataset_store import ColumnarDatasetStore
+        return ColumnarDatasetStore(path)
+
+    def deduplicate(self, records: Optional[List[Dict]] = None, threshold: float = 0.8,
+                    mode: str = "drop", num_perm: int = 128, bands: int = 32) -> Tuple[List[Dict], Dict]:
+        """
+        Remove or cluster near-duplicate samples using MinHash/LSH over the preprocessed buggy code.
+        In "drop" mode only the first sample of each cluster is kept; in "cluster" mode every sample
+        is kept and tagged with a 'cluster_id'. When records is None, self.datasets is updated.
+        Returns the resulting records and a report with cluster sizes.
+        """
+        from .dedup import MinHashDeduplicator, cluster_report
+
+        if mode not in ("drop", "cluster"):
+            raise ValueError(f"Unknown deduplication mode: {mode}")
+        source = records if records is not None else self.datasets
+        deduplicator = MinHashDeduplicator(num_perm=num_perm, bands=bands, threshold=threshold)
+        cluster_ids = deduplicator.cluster([self.preprocess_code(item['buggy_code']) for item in source])
+
+        if mode == "drop":
+            result = [item for i, item in enumerate(source) if cluster_ids[i] == i]
+        else:
+            result = [dict(item, cluster_id=int(cluster_ids[i])) for i, item in enumerate(source)]
+        if records is None:
+            self.datasets = result
+        return result, cluster_report(cluster_ids)
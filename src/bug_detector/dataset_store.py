@@ -0,0 +1,135 @@
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .data_collector import DataCollector
+
+# Samples are stored pairwise: sample 2k is the buggy code of record k and sample 2k + 1 its fix
+BUGGY_LABEL = 1
+FIXED_LABEL = 0
+
+_collector = None
+
+
+def _preprocess_record(item: Dict) -> Tuple[str, str, str]:
+    global _collector
+    if _collector is None:
+        _collector = DataCollector()
+    return (
+        _collector.preprocess_code(item['buggy_code']),
+        _collector.preprocess_code(item['fixed_code']),
+        item.get('bug_type', 'unknown')
+    )
+
+
+def build_dataset_store(records: Iterable[Dict], path: str, max_workers: Optional[int] = None,
+                        batch_size: int = 10000) -> "ColumnarDatasetStore":
+    """
+    Preprocess records across a process pool and write them to a columnar store at path:
+    one concatenated UTF-8 buffer plus NumPy offsets, labels and bug-type arrays.
+    """
+    os.makedirs(path, exist_ok=True)
+    offsets = array('q', [0])
+    labels = array('b')
+    bug_type_ids = array('i')
+    bug_types = {}
+
+    workers = max_workers or os.cpu_count() or 1
+    records = iter(records)
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(os.path.join(path, 'code.bin'), 'wb') as code_file:
+        while True:
+            # Submit in batches so the input iterator is never materialized in full
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            chunksize = max(1, len(batch) // (workers * 4))
+            for buggy, fixed, bug_type in executor.map(_preprocess_record, batch, chunksize=chunksize):
+                type_id = bug_types.setdefault(bug_type, len(bug_types))
+                for code, label in ((buggy, BUGGY_LABEL), (fixed, FIXED_LABEL)):
+                    data = code.encode('utf-8')
+                    code_file.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                    labels.append(label)
+                    bug_type_ids.append(type_id)
+
+    np.save(os.path.join(path, 'offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+    np.save(os.path.join(path, 'labels.npy'), np.frombuffer(labels, dtype=np.int8))
+    np.save(os.path.join(path, 'bug_types.npy'), np.frombuffer(bug_type_ids, dtype=np.int32))
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump({"version": 1, "samples": len(labels), "bug_types": list(bug_types)}, file)
+    return ColumnarDatasetStore(path)
+
+
+class ColumnarDatasetStore:
+    """
+    Read-only, memory-mapped view of a store written by build_dataset_store.
+    Opening is near-instant; code is decoded only when a sample is accessed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        self.bug_type_names = meta["bug_types"]
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(path, 'labels.npy'), mmap_mode='r')
+        self.bug_types = np.load(os.path.join(path, 'bug_types.npy'), mmap_mode='r')
+
+        code_path = os.path.join(path, 'code.bin')
+        if os.path.getsize(code_path) > 0:
+            self.code = np.memmap(code_path, dtype=np.uint8, mode='r')
+        else:
+            self.code = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def code_bytes(self, index: int) -> memoryview:
+        """
+        Return the UTF-8 bytes of a sample without copying them out of the mapping.
+        """
+        return memoryview(self.code[self.offsets[index]:self.offsets[index + 1]])
+
+    def get_code(self, index: int) -> str:
+        return str(self.code_bytes(index), 'utf-8')
+
+    def __getitem__(self, index: int) -> Dict:
+        return {
+            "code": self.get_code(index),
+            "label": int(self.labels[index]),
+            "bug_type": self.bug_type_names[self.bug_types[index]]
+        }
+
+    def indices(self, label: Optional[int] = None, bug_type: Optional[str] = None) -> np.ndarray:
+        """
+        Return the sample indices matching a label and/or bug type.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if label is not None:
+            mask &= self.labels == label
+        if bug_type is not None:
+            if bug_type not in self.bug_type_names:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self.bug_types == self.bug_type_names.index(bug_type)
+        return np.flatnonzero(mask)
+
+    def iter_training_data(self) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily yield (buggy code, fixed code) pairs.
+        """
+        for index in range(0, len(self), 2):
+            yield self.get_code(index), self.get_code(index + 1)
+
+    def get_training_data(self) -> Tuple[List[str], List[str]]:
+        """
+        Get (buggy code, fixed code) lists, as DataCollector.get_training_data does.
+        """
+        buggy_codes = [self.get_code(index) for index in range(0, len(self), 2)]
+        fixed_codes = [self.get_code(index) for index in range(1, len(self), 2)]
+        return buggy_codes, fixed_codes
@@ -0,0 +1,120 @@
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+# Hash arithmetic is done modulo a 31-bit prime so that a * x + b never overflows uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+class MinHashDeduplicator:
+    """
+    Finds near-duplicate texts with MinHash signatures and a banded LSH index.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 5,
+                 threshold: float = 0.8, seed: int = 1, batch_shingles: int = 1 << 20):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.batch_shingles = batch_shingles
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._token_weights = rng.integers(1, 1 << 32, size=shingle_size, dtype=np.uint64)
+        self._band_weights = rng.integers(1, 1 << 32, size=self.rows, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        Hash the overlapping token k-grams of a text into 31-bit values.
+        """
+        tokens = text.split()
+        if not tokens:
+            return np.zeros(1, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens),
+                             dtype=np.uint64, count=len(tokens))
+        size = min(self.shingle_size, len(hashes))
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, size)
+        # uint64 arithmetic wraps around, which is fine for hashing
+        combined = (windows * self._token_weights[:size]).sum(axis=1)
+        return np.unique(combined % _PRIME)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """
+        Compute MinHash signatures of shape (len(texts), num_perm).
+        Texts are processed in batches with one vectorized permutation pass per batch.
+        """
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        budget = max(1, self.batch_shingles // self.num_perm)
+        start = 0
+        while start < len(texts):
+            batch = []
+            total = 0
+            while start + len(batch) < len(texts) and (not batch or total < budget):
+                shingles = self.shingles(texts[start + len(batch)])
+                batch.append(shingles)
+                total += len(shingles)
+            lengths = np.fromiter((len(shingles) for shingles in batch), dtype=np.int64, count=len(batch))
+            boundaries = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            values = np.concatenate(batch)[None, :]
+            permuted = (self._a * values + self._b) % _PRIME
+            signatures[start:start + len(batch)] = np.minimum.reduceat(permuted, boundaries, axis=1).T
+            start += len(batch)
+        return signatures
+
+    def cluster(self, texts: List[str]) -> np.ndarray:
+        """
+        Assign a cluster id to every text; near-duplicates share an id.
+        Cluster ids are the index of the cluster's first member.
+        """
+        signatures = self.signatures(texts)
+        count = len(texts)
+        parent = np.arange(count)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            rows = signatures[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+            keys = (rows * self._band_weights).sum(axis=1)
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            group_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+            group_ends = np.append(group_starts[1:], count)
+            for group_start, group_end in zip(group_starts, group_ends):
+                if group_end - group_start < 2:
+                    continue
+                members = order[group_start:group_end]
+                # Verify candidates against the bucket's first member with the full signature
+                similarity = (signatures[members[1:]] == signatures[members[0]]).mean(axis=1)
+                root = find(members[0])
+                for member in members[1:][similarity >= self.threshold]:
+                    other = find(member)
+                    if other != root:
+                        parent[max(root, other)] = min(root, other)
+                        root = min(root, other)
+
+        return np.array([find(i) for i in range(count)], dtype=np.int64)
+
+
+def cluster_report(cluster_ids: np.ndarray) -> Dict:
+    """
+    Summarize cluster assignments: counts and a histogram of cluster sizes.
+    """
+    _, sizes = np.unique(cluster_ids, return_counts=True)
+    size_values, size_counts = np.unique(sizes, return_counts=True)
+    return {
+        "samples": int(len(cluster_ids)),
+        "clusters": int(len(sizes)),
+        "duplicates": int(len(cluster_ids) - len(sizes)),
+        "largest_cluster": int(sizes.max()) if len(sizes) else 0,
+        "cluster_sizes": {int(size): int(n) for size, n in zip(size_values, size_counts)}
+    }
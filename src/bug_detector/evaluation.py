@@ -1,6 +1,366 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 import json
 
+import numpy as np
+
+from .results import SEVERITIES
+
+# Outcome codes: 2 * predicted + actual
+TN, FN, FP, TP = 0, 1, 2, 3
+
+
+def _flag(value) -> int:
+    # Missing labels stay distinct from False, as in the original equality-based accuracy
+    if value is None:
+        return -1
+    return 1 if value else 0
+
+
+def _bug_type(item: Dict) -> str:
+    bug_type = item.get('bug_type')
+    if bug_type is None and item.get('issues'):
+        bug_type = item['issues'][0].get('type')
+    return str(bug_type) if bug_type is not None else 'unknown'
+
+
+def _severity(item: Dict) -> str:
+    severity = item.get('severity')
+    if severity is None:
+        ranked = [issue.get('severity') for issue in item.get('issues', []) if issue.get('severity') in SEVERITIES]
+        if ranked:
+            severity = min(ranked, key=SEVERITIES.index)
+    return str(severity) if severity is not None else 'unknown'
+
+
+def metrics_from_counts(tp, fp, fn, tn, correct, total) -> Dict:
+    """
+    Compute accuracy, precision, recall and F1 from confusion counts.
+    Works element-wise when the counts are NumPy arrays.
+    """
+    tp, fp, fn, correct, total = (np.asarray(value, dtype=np.float64) for value in (tp, fp, fn, correct, total))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = np.where(total > 0, correct / total, 0.0)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1_score = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    metrics = {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1_score}
+    if accuracy.ndim == 0:
+        return {name: float(value) for name, value in metrics.items()}
+    return metrics
+
+
+class ConfusionEngine:
+    """
+    Converts predictions and ground truth to NumPy label arrays once and derives the
+    confusion matrix, per-group breakdowns and bootstrap intervals from them.
+    """
+
+    def __init__(self, predictions: List[Dict], actual: List[Dict]):
+        # Accuracy has always been reported over len(predictions), even if actual is shorter
+        self.total = len(predictions) if actual else 0
+        paired = min(len(predictions), len(actual))
+        predicted = np.fromiter((_flag(item.get('has_issues')) for item in predictions[:paired]),
+                                dtype=np.int8, count=paired)
+        expected = np.fromiter((_flag(item.get('has_issues')) for item in actual[:paired]),
+                               dtype=np.int8, count=paired)
+        self.correct = predicted == expected
+        self.outcomes = (2 * (predicted == 1) + (expected == 1)).astype(np.int64)
+        self._actual = actual[:paired]
+        self._groups = {}
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Return the confusion matrix and the number of exact label matches.
+        """
+        tn, fn, fp, tp = np.bincount(self.outcomes, minlength=4)
+        return {"tp": int(tp), "fp": int(fp), "fn": int(fn), "tn": int(tn),
+                "correct": int(np.count_nonzero(self.correct))}
+
+    def metrics(self) -> Dict:
+        counts = self.counts()
+        return metrics_from_counts(counts["tp"], counts["fp"], counts["fn"], counts["tn"],
+                                   counts["correct"], self.total)
+
+    def breakdown(self, field: str) -> Dict[str, Dict]:
+        """
+        Return metrics and counts per ground-truth 'bug_type' or 'severity'.
+        All groups are counted in a single bincount over (group, outcome) pairs.
+        """
+        names, group_ids = self._group_ids(field)
+        size = len(names)
+        confusion = np.bincount(group_ids * 4 + self.outcomes, minlength=size * 4).reshape(size, 4)
+        correct = np.bincount(group_ids, weights=self.correct, minlength=size)
+        samples = np.bincount(group_ids, minlength=size)
+        metrics = metrics_from_counts(confusion[:, TP], confusion[:, FP], confusion[:, FN], confusion[:, TN],
+                                      correct, samples)
+        report = {}
+        for index, name in enumerate(names):
+            report[name] = {metric: float(values[index]) for metric, values in metrics.items()}
+            report[name].update({
+                "samples": int(samples[index]),
+                "tp": int(confusion[index, TP]),
+                "fp": int(confusion[index, FP]),
+                "fn": int(confusion[index, FN]),
+                "tn": int(confusion[index, TN])
+            })
+        return report
+
+    def bootstrap(self, resamples: int = 1000, confidence: float = 0.95, seed: Optional[int] = None,
+                  max_batch_elements: int = 1 << 24) -> Dict[str, Dict]:
+        """
+        Return percentile bootstrap confidence intervals for each metric.
+        Resamples are drawn in batches of index matrices so memory stays bounded.
+        """
+        size = len(self.outcomes)
+        if size == 0 or resamples <= 0:
+            return {}
+        rng = np.random.default_rng(seed)
+        batch = max(1, min(resamples, max_batch_elements // size))
+        values = {name: [] for name in ("accuracy", "precision", "recall", "f1_score")}
+        done = 0
+        while done < resamples:
+            count = min(batch, resamples - done)
+            indices = rng.integers(0, size, size=(count, size))
+            rows = np.arange(count)[:, None] * 4
+            confusion = np.bincount((rows + self.outcomes[indices]).ravel(), minlength=count * 4).reshape(count, 4)
+            correct = self.correct[indices].sum(axis=1)
+            metrics = metrics_from_counts(confusion[:, TP], confusion[:, FP], confusion[:, FN], confusion[:, TN],
+                                          correct, size)
+            for name, metric in metrics.items():
+                values[name].append(metric)
+            done += count
+
+        tail = (1 - confidence) / 2 * 100
+        intervals = {}
+        for name, parts in values.items():
+            low, high = np.percentile(np.concatenate(parts), [tail, 100 - tail])
+            intervals[name] = {"low": float(low), "high": float(high)}
+        return intervals
+
+    def _group_ids(self, field: str):
+        if field not in self._groups:
+            key = _severity if field == 'severity' else _bug_type
+            keys = [key(item) for item in self._actual]
+            names = sorted(set(keys))
+            positions = {name: index for index, name in enumerate(names)}
+            group_ids = np.fromiter((positions[name] for name in keys), dtype=np.int64, count=len(keys))
+            self._groups[field] = (names, group_ids)
+        return self._groups[field]
+
+
+class MetricsAccumulator:
+    """
+    Streaming, mergeable version of the confusion engine: counts are updated as each
+    result arrives and accumulators from different workers or shards can be added together.
+    """
+
+    # Each row holds [tn, fn, fp, tp, correct, samples]
+    _ROW = 6
+
+    def __init__(self):
+        self.counts = np.zeros(self._ROW, dtype=np.int64)
+        self.by_bug_type = {}
+        self.by_severity = {}
+
+    def update(self, prediction: Dict, actual: Dict):
+        """
+        Add one prediction and its ground truth.
+        """
+        predicted = _flag(prediction.get('has_issues'))
+        expected = _flag(actual.get('has_issues'))
+        row = np.zeros(self._ROW, dtype=np.int64)
+        row[2 * (predicted == 1) + (expected == 1)] = 1
+        row[4] = predicted == expected
+        row[5] = 1
+        self._add_row(row, _bug_type(actual), _severity(actual))
+
+    def update_batch(self, predictions: List[Dict], actual: List[Dict]):
+        """
+        Add a batch of paired predictions with one vectorized pass.
+        """
+        engine = ConfusionEngine(predictions, actual)
+        overall = np.zeros(len(engine.outcomes), dtype=np.int64)
+        self.counts += self._rows(engine.outcomes, engine.correct, overall, 1)[0]
+        for field, groups in (('bug_type', self.by_bug_type), ('severity', self.by_severity)):
+            names, group_ids = engine._group_ids(field)
+            for name, row in zip(names, self._rows(engine.outcomes, engine.correct, group_ids, len(names))):
+                groups[name] = groups.get(name, 0) + row
+
+    def merge(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        """
+        Return a new accumulator holding the counts of both; merging is associative and commutative.
+        """
+        merged = MetricsAccumulator()
+        for source in (self, other):
+            merged.counts += source.counts
+            for groups, source_groups in ((merged.by_bug_type, source.by_bug_type),
+                                          (merged.by_severity, source.by_severity)):
+                for name, row in source_groups.items():
+                    groups[name] = groups.get(name, 0) + row
+        return merged
+
+    def __add__(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        return self.merge(other)
+
+    def to_dict(self) -> Dict:
+        """
+        Return the counts as plain lists, suitable for JSON.
+        """
+        return {
+            "counts": self.counts.tolist(),
+            "by_bug_type": {name: row.tolist() for name, row in self.by_bug_type.items()},
+            "by_severity": {name: row.tolist() for name, row in self.by_severity.items()}
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricsAccumulator":
+        accumulator = cls()
+        accumulator.counts = np.array(data["counts"], dtype=np.int64)
+        accumulator.by_bug_type = {name: np.array(row, dtype=np.int64) for name, row in data.get("by_bug_type", {}).items()}
+        accumulator.by_severity = {name: np.array(row, dtype=np.int64) for name, row in data.get("by_severity", {}).items()}
+        return accumulator
+
+    @classmethod
+    def from_json(cls, text: str) -> "MetricsAccumulator":
+        return cls.from_dict(json.loads(text))
+
+    def metrics(self) -> Dict:
+        """
+        Return the same metrics, confusion matrix and breakdowns as evaluate_detailed
+        (without bootstrap intervals, which need the individual samples).
+        """
+        metrics = self._row_metrics(self.counts)
+        tn, fn, fp, tp, correct, _ = (int(value) for value in self.counts)
+        metrics["confusion_matrix"] = {"tp": tp, "fp": fp, "fn": fn, "tn": tn, "correct": correct}
+        metrics["by_bug_type"] = self._breakdown(self.by_bug_type)
+        metrics["by_severity"] = self._breakdown(self.by_severity)
+        return metrics
+
+    def _add_row(self, row: np.ndarray, bug_type: str, severity: str):
+        self.counts += row
+        self.by_bug_type[bug_type] = self.by_bug_type.get(bug_type, 0) + row
+        self.by_severity[severity] = self.by_severity.get(severity, 0) + row
+
+    def _rows(self, outcomes: np.ndarray, correct: np.ndarray, group_ids: np.ndarray, size: int) -> np.ndarray:
+        rows = np.zeros((size, self._ROW), dtype=np.int64)
+        rows[:, :4] = np.bincount(group_ids * 4 + outcomes, minlength=size * 4).reshape(size, 4)
+        rows[:, 4] = np.bincount(group_ids, weights=correct, minlength=size)
+        rows[:, 5] = np.bincount(group_ids, minlength=size)
+        return rows
+
+    def _row_metrics(self, row: np.ndarray) -> Dict:
+        return metrics_from_counts(row[TP], row[FP], row[FN], row[TN], row[4], row[5])
+
+    def _breakdown(self, groups: Dict[str, np.ndarray]) -> Dict[str, Dict]:
+        report = {}
+        for name in sorted(groups):
+            row = groups[name]
+            report[name] = self._row_metrics(row)
+            report[name].update({"samples": int(row[5]), "tp": int(row[TP]), "fp": int(row[FP]),
+                                 "fn": int(row[FN]), "tn": int(row[TN])})
+        return report
+
+
+def _issue_type(issue: Dict) -> str:
+    return str(issue.get('type', '')).lower().replace(' ', '_')
+
+
+def _issue_file(issue: Dict) -> str:
+    return str(issue.get('file', issue.get('path', '')))
+
+
+def _issue_line(issue: Dict) -> Optional[int]:
+    line = issue.get('line_number')
+    if isinstance(line, bool) or not isinstance(line, (int, float)):
+        return None
+    return int(line)
+
+
+class IssueIndex:
+    """
+    Ground-truth issues indexed by (file, type) as sorted line arrays, so predicted
+    issues can be matched with binary search instead of comparing every pair.
+    """
+
+    def __init__(self, actual_issues: List[Dict]):
+        lines = {}
+        self.unlocated = {}
+        for issue in actual_issues:
+            key = (_issue_file(issue), _issue_type(issue))
+            line = _issue_line(issue)
+            if line is None:
+                # Issues without a line can never be matched but still count against recall
+                self.unlocated[key[1]] = self.unlocated.get(key[1], 0) + 1
+            else:
+                lines.setdefault(key, []).append(line)
+        self.lines = {key: np.sort(np.array(values, dtype=np.int64)) for key, values in lines.items()}
+
+    def match(self, predicted_issues: List[Dict], tolerance: int = 2) -> Dict:
+        """
+        Match predicted issues one-to-one to ground-truth issues of the same file and type
+        whose line is within tolerance. Returns localization precision/recall, overall and per type.
+        """
+        predicted = {}
+        for issue in predicted_issues:
+            line = _issue_line(issue)
+            predicted.setdefault((_issue_file(issue), _issue_type(issue)), []).append(-1 if line is None else line)
+
+        counts = {}
+        for key in set(predicted) | set(self.lines):
+            truth = self.lines.get(key, np.zeros(0, dtype=np.int64))
+            guesses = np.sort(np.array(predicted.get(key, []), dtype=np.int64))
+            located = guesses[guesses >= 0]
+            row = counts.setdefault(key[1], [0, 0, 0])
+            row[0] += len(guesses)
+            row[1] += len(truth)
+            row[2] += _count_matches(located, truth, tolerance)
+        for issue_type, missing in self.unlocated.items():
+            counts.setdefault(issue_type, [0, 0, 0])[1] += missing
+
+        by_type = {issue_type: _localization_metrics(*counts[issue_type]) for issue_type in sorted(counts)}
+        totals = [sum(row[i] for row in counts.values()) for i in range(3)]
+        report = _localization_metrics(*totals)
+        report["tolerance"] = tolerance
+        report["by_type"] = by_type
+        return report
+
+
+def _count_matches(predicted_lines: np.ndarray, actual_lines: np.ndarray, tolerance: int) -> int:
+    """
+    Size of the largest one-to-one matching between two sorted line arrays where
+    matched lines differ by at most tolerance.
+    """
+    if not len(predicted_lines) or not len(actual_lines):
+        return 0
+    low = np.searchsorted(actual_lines, predicted_lines - tolerance, side='left')
+    high = np.searchsorted(actual_lines, predicted_lines + tolerance, side='right')
+    # With equal-width windows over sorted lines, taking the first free candidate is optimal
+    matched = 0
+    next_free = 0
+    for first, end in zip(low.tolist(), high.tolist()):
+        next_free = max(next_free, first)
+        if next_free < end:
+            matched += 1
+            next_free += 1
+    return matched
+
+
+def _localization_metrics(predicted: int, actual: int, matched: int) -> Dict:
+    precision = matched / predicted if predicted else 0.0
+    recall = matched / actual if actual else 0.0
+    return {
+        "predicted": predicted,
+        "actual": actual,
+        "matched": matched,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    }
+
+
 class EvaluationMetrics:
     """
     Implements evaluation metrics for the bug detection system.
@@ -15,54 +375,19 @@ class EvaluationMetrics:
         """
         if not predictions or not actual:
             return 0.0
-        
-        correct_predictions = 0
-        total_predictions = len(predictions)
-        
-        for pred, act in zip(predictions, actual):
-            # Simplified accuracy calculation
-            if pred.get('has_issues') == act.get('has_issues'):
-                correct_predictions += 1
-        
-        return correct_predictions / total_predictions if total_predictions > 0 else 0.0
+        return ConfusionEngine(predictions, actual).metrics()["accuracy"]
     
     def calculate_precision(self, predictions: List[Dict], actual: List[Dict]) -> float:
         """
         Calculate precision of predictions.
         """
-        true_positives = 0
-        false_positives = 0
-        
-        for pred, act in zip(predictions, actual):
-            pred_has_issues = pred.get('has_issues', False)
-            act_has_issues = act.get('has_issues', False)
-            
-            if pred_has_issues and act_has_issues:
-                true_positives += 1
-            elif pred_has_issues and not act_has_issues:
-                false_positives += 1
-        
-        precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-        return precision
+        return ConfusionEngine(predictions, actual).metrics()["precision"]
     
     def calculate_recall(self, predictions: List[Dict], actual: List[Dict]) -> float:
         """
         Calculate recall of predictions.
         """
-        true_positives = 0
-        false_negatives = 0
-        
-        for pred, act in zip(predictions, actual):
-            pred_has_issues = pred.get('has_issues', False)
-            act_has_issues = act.get('has_issues', False)
-            
-            if pred_has_issues and act_has_issues:
-                true_positives += 1
-            elif not pred_has_issues and act_has_issues:
-                false_negatives += 1
-        
-        recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-        return recall
+        return ConfusionEngine(predictions, actual).metrics()["recall"]
     
     def calculate_f1_score(self, precision: float, recall: float) -> float:
         """
@@ -76,18 +401,36 @@ class EvaluationMetrics:
         """
         Evaluate the system using multiple metrics.
         """
-        accuracy = self.calculate_accuracy(predictions, actual)
-        precision = self.calculate_precision(predictions, actual)
-        recall = self.calculate_recall(predictions, actual)
-        f1_score = self.calculate_f1_score(precision, recall)
-        
+        metrics = ConfusionEngine(predictions, actual).metrics()
         return {
-            "accuracy": accuracy,
-            "precision": precision,
-            "recall": recall,
-            "f1_score": f1_score
+            "accuracy": metrics["accuracy"],
+            "precision": metrics["precision"],
+            "recall": metrics["recall"],
+            "f1_score": metrics["f1_score"]
         }
     
+    def evaluate_detailed(self, predictions: List[Dict], actual: List[Dict], resamples: int = 1000,
+                          confidence: float = 0.95, seed: Optional[int] = None) -> Dict:
+        """
+        Evaluate the system with the confusion matrix, per bug type and per severity
+        breakdowns and bootstrap confidence intervals.
+        """
+        engine = ConfusionEngine(predictions, actual)
+        metrics = engine.metrics()
+        metrics["confusion_matrix"] = engine.counts()
+        metrics["by_bug_type"] = engine.breakdown('bug_type')
+        metrics["by_severity"] = engine.breakdown('severity')
+        metrics["confidence_intervals"] = engine.bootstrap(resamples, confidence, seed)
+        return metrics
+    
+    def evaluate_localization(self, predicted_issues: List[Dict], actual_issues: List[Dict],
+                              tolerance: int = 2) -> Dict:
+        """
+        Evaluate whether the right issues were found on the right lines.
+        Issues carry 'type', 'line_number' and, for multi-file sets, 'file' (or 'path').
+        """
+        return IssueIndex(actual_issues).match(predicted_issues, tolerance)
+    
     def generate_report(self, metrics: Dict) -> str:
         """
         Generate a human-readable evaluation report.
@@ -1,28 +1,20 @@
 import os
-import google.generativeai as genai
-from typing import Dict, List
-from dotenv import load_dotenv
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from .cache import ResultCache, default_cache
+from . import clients
+from .backends import BackendRegistry, default_registry
+from .chunking import estimate_tokens
+from .rate_limiter import RateLimiter
+from .results import AnalysisResult, Issue, extract_json, parse_analysis_response
+from .streaming import IssueStreamParser
+from .prompting import CompactCode, PromptBuilder, render_prompt
 
-load_dotenv()
+# Bump whenever the analysis prompt changes so stale cached results are ignored
+PROMPT_VERSION = "3"
 
-class GeminiIntegration:
-    """
-    Handles integration with the Gemini API for code analysis.
-    """
-
-    def __init__(self):
-        self.api_key = os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-    
-    def analyze_code_for_bugs(self, code: str, language: str = "python") -> Dict:
-        """
-        Analyze code for potential bugs using Gemini.
-        """
-        prompt = f"""
+ANALYSIS_PROMPT = """
         You are an expert code reviewer. Analyze the following {language} code for potential bugs, 
         security vulnerabilities, performance issues, and code quality problems.
         
@@ -49,54 +41,39 @@ class GeminiIntegration:
         
         Be specific about line numbers and provide actionable suggestions.
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            # In a real implementation, we would parse the JSON response
-            # For now, we'll return a mock response
-            return {
-                "has_issues": True,
+
+PACKED_ANALYSIS_PROMPT = """
+        You are an expert code reviewer. Analyze each of the following {count} {language} code
+        snippets for potential bugs, security vulnerabilities, performance issues, and code quality problems.
+        Each snippet is delimited by "=== SNIPPET <index> ===" and "=== END SNIPPET <index> ===".
+
+        {sections}
+
+        Respond with only a JSON array containing one object per snippet, in this format:
+        [
+            {{
+                "snippet_index": index,
+                "has_issues": true/false,
                 "issues": [
-                    {
-                        "type": "Logic Error",
-                        "description": "Potential null pointer exception",
-                        "severity": "high",
-                        "line_number": 5,
-                        "suggestion": "Add null check before accessing object",
-                        "confidence": 85
-                    }
+                    {{
+                        "type": "bug_type",
+                        "description": "detailed description of the issue",
+                        "severity": "critical/high/medium/low",
+                        "line_number": line_number,
+                        "suggestion": "how to fix the issue",
+                        "confidence": 0-100
+                    }}
                 ],
-                "code_quality_score": 70,
-                "security_score": 65,
-                "performance_score": 80
-            }
-        except Exception as e:
-            error_msg = str(e)
-            # Check if it's a quota exceeded error
-            if "429" in error_msg or "quota" in error_msg.lower() or "rate limit" in error_msg.lower():
-                return {
-                    "error": f"API quota exceeded. Please check your billing details. {str(e)}",
-                    "has_issues": False,
-                    "issues": [],
-                    "code_quality_score": 0,
-                    "security_score": 0,
-                    "performance_score": 0
-                }
-            else:
-                return {
-                    "error": f"Error calling Gemini API: {str(e)}",
-                    "has_issues": False,
-                    "issues": [],
-                    "code_quality_score": 0,
-                    "security_score": 0,
-                    "performance_score": 0
-                }
-    
-    def explain_fix(self, buggy_code: str, fixed_code: str) -> str:
-        """
-        Explain how the fixed code addresses the issues in the buggy code.
+                "code_quality_score": 0-100,
+                "security_score": 0-100,
+                "performance_score": 0-100
+            }}
+        ]
+
+        Line numbers are relative to the first line of each snippet.
         """
-        prompt = f"""
+
+EXPLAIN_FIX_PROMPT = """
         Explain how the fixed code addresses the issues in the buggy code.
         
         Buggy Code:
@@ -107,9 +84,281 @@ class GeminiIntegration:
         
         Provide a clear explanation of what was wrong and how it was fixed.
         """
-        
+
+
+class GeminiIntegration:
+    """
+    Handles integration with the Gemini API for code analysis.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None, model_name: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None, backends: Optional[BackendRegistry] = None,
+                 prompts: Optional[PromptBuilder] = None):
+        clients.load_environment()
+        self.api_key = os.getenv('GEMINI_API_KEY')
+        self.backends = backends if backends is not None else default_registry(model_name, rate_limiter)
+        self.model_name = self.backends.primary.name
+        self.cache = cache if cache is not None else default_cache()
+        self.rate_limiter = self.backends.primary_rate_limiter
+        self.prompts = prompts if prompts is not None else PromptBuilder()
+
+    def generate(self, prompt: str, **kwargs):
+        """
+        Send a prompt through the model tiers; quota handling, retries and hedging live in the registry.
+        """
+        return self.backends.generate(prompt, **kwargs)
+
+    def remaining_budget(self) -> Dict:
+        """
+        Return the requests still available this minute and this day.
+        """
+        return self.rate_limiter.remaining() if self.rate_limiter is not None else {}
+
+    def cache_key(self, code: str, language: str = "python") -> str:
+        """
+        Build the cache key for an analysis request. Code that compacts to the same prompt shares
+        a key; the line map is included because reported line numbers depend on it.
+        """
+        compacted = self.prompts.compact(code, language)
+        line_map = ",".join(map(str, compacted.line_map))
+        material = "\x00".join([PROMPT_VERSION, self.model_name, language, compacted.text, line_map])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def analyze_code_for_bugs(self, code: str, language: str = "python") -> Dict:
+        """
+        Analyze code for potential bugs using Gemini.
+        Results are served from the cache when available; error results are never cached.
+        """
+        key = self.cache_key(code, language)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._analyze_uncached(code, language)
+        if "error" not in result:
+            self.cache.set(key, result)
+        return result
+
+    def _analysis_prompt(self, code: str, language: str) -> str:
+        return render_prompt(ANALYSIS_PROMPT, code=code, language=language)
+
+    def _prompt_parts(self, code: str, language: str) -> List[CompactCode]:
+        """
+        Compact the code and split it so that every analysis prompt fits the token budget.
+        """
+        return self.prompts.split(code, language, estimate_tokens(self._analysis_prompt("", language)))
+
+    def _analyze_uncached(self, code: str, language: str) -> Dict:
+        parts = []
+        for part in self._prompt_parts(code, language):
+            try:
+                response = self.generate(self._analysis_prompt(part.text, language))
+            except Exception as e:
+                return _error_result(e)
+
+            try:
+                parsed = parse_analysis_response(response.text)
+            except ValueError as e:
+                return _parse_error_result(e)
+            part.remap_issues(parsed.issues)
+            parts.append(parsed)
+        return _merge_parts(parts).to_dict()
+
+    def analyze(self, code: str, language: str = "python") -> AnalysisResult:
+        """
+        Analyze code for potential bugs and return a typed AnalysisResult.
+        """
+        return AnalysisResult.from_dict(self.analyze_code_for_bugs(code, language))
+
+    def stream_analysis(self, code: str, language: str = "python") -> Iterator[Tuple[str, Dict]]:
+        """
+        Analyze code with a streaming Gemini call, yielding ("issue", issue) events as soon as each
+        issue is complete and a final ("result", result) event carrying the scores.
+        Failures are reported as a final ("error", result) event.
+        """
+        key = self.cache_key(code, language)
+        cached = self.cache.get(key)
+        if cached is not None:
+            for issue in cached.get("issues", []):
+                yield "issue", issue
+            yield "result", cached
+            return
+
+        parts = []
+        for part in self._prompt_parts(code, language):
+            parser = IssueStreamParser()
+            issues = []
+            try:
+                response = self.generate(self._analysis_prompt(part.text, language), stream=True)
+                for chunk in response:
+                    for issue in parser.feed(chunk.text):
+                        issue = Issue.from_dict(issue)
+                        part.remap_issues([issue])
+                        issues.append(issue)
+                        yield "issue", issue.to_dict()
+            except Exception as e:
+                yield "error", _error_result(e)
+                return
+
+            try:
+                parsed = parse_analysis_response(parser.buffer)
+            except ValueError as e:
+                # Same as the non-streaming path: report the failure and keep it out of the cache
+                yield "error", _parse_error_result(e)
+                return
+            # Keep the streamed issues so the final result matches what the client already saw
+            parsed.issues = issues
+            parsed.has_issues = bool(issues)
+            parts.append(parsed)
+        result = _merge_parts(parts).to_dict()
+        self.cache.set(key, result)
+        yield "result", result
+
+    def analyze_code_batch(self, code_list: List[str], language: str = "python",
+                           max_chars: int = 12000, max_workers: int = 1) -> List[Dict]:
+        """
+        Analyze several snippets, packing small ones into shared prompts of at most max_chars.
+        Snippets missing from a packed response are re-analyzed one at a time; when the packed
+        call itself fails, every snippet in the group gets the error result.
+        """
+        results = [None] * len(code_list)
+        keys = [self.cache_key(code, language) for code in code_list]
+        groups = []
+        current = []
+        current_size = 0
+        for i, code in enumerate(code_list):
+            cached = self.cache.get(keys[i])
+            if cached is not None:
+                results[i] = cached
+                continue
+            if current and current_size + len(code) > max_chars:
+                groups.append(current)
+                current = []
+                current_size = 0
+            current.append(i)
+            current_size += len(code)
+        if current:
+            groups.append(current)
+
+        def run_group(group):
+            if len(group) == 1:
+                return {group[0]: self.analyze_code_for_bugs(code_list[group[0]], language)}
+            packed = self._analyze_packed([code_list[i] for i in group], language)
+            group_results = {}
+            for position, i in enumerate(group):
+                result = packed.get(position)
+                if result is None:
+                    group_results[i] = self.analyze_code_for_bugs(code_list[i], language)
+                else:
+                    if "error" not in result:
+                        self.cache.set(keys[i], result)
+                    group_results[i] = result
+            return group_results
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for group_results in executor.map(run_group, groups):
+                for i, result in group_results.items():
+                    results[i] = result
+        return results
+
+    def _analyze_packed(self, code_list: List[str], language: str) -> Dict[int, Dict]:
+        compacted = [self.prompts.compact(code, language) for code in code_list]
+        sections = "\n".join(
+            f"=== SNIPPET {i} ===\n{code.text}=== END SNIPPET {i} ===" for i, code in enumerate(compacted)
+        )
+        prompt = render_prompt(PACKED_ANALYSIS_PROMPT, count=len(code_list), language=language, sections=sections)
+
         try:
-            response = self.model.generate_content(prompt)
+            response = self.generate(prompt)
+        except Exception as e:
+            # Retrying each snippet alone would only repeat the failing call
+            error = _error_result(e)
+            return {index: dict(error) for index in range(len(code_list))}
+        try:
+            entries = extract_json(response.text)
+        except Exception:
+            return {}
+        if not isinstance(entries, list):
+            return {}
+
+        parsed = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get("issues"), list):
+                continue
+            index = entry.get("snippet_index")
+            if not isinstance(index, int) or not 0 <= index < len(code_list):
+                continue
+            entry = {key: value for key, value in entry.items() if key != "snippet_index"}
+            result = AnalysisResult.from_dict(entry)
+            compacted[index].remap_issues(result.issues)
+            parsed[index] = result.to_dict()
+        return parsed
+
+    def explain_fix(self, buggy_code: str, fixed_code: str, language: str = "python") -> str:
+        """
+        Explain how the fixed code addresses the issues in the buggy code.
+        Both versions are compacted and, if needed, truncated to share the token budget.
+        """
+        overhead = estimate_tokens(render_prompt(EXPLAIN_FIX_PROMPT, buggy_code="", fixed_code=""))
+        share = max(1, (self.prompts.max_tokens - overhead) // 2)
+        prompt = render_prompt(
+            EXPLAIN_FIX_PROMPT,
+            buggy_code=self.prompts.fit(buggy_code, language, share),
+            fixed_code=self.prompts.fit(fixed_code, language, share)
+        )
+
+        try:
+            response = self.generate(prompt)
             return response.text
         except Exception as e:
-            return f"Error getting explanation: {str(e)}"
\ No newline at end of file
+            return f"Error getting explanation: {str(e)}"
+
+
+def _merge_parts(parts: List[AnalysisResult]) -> AnalysisResult:
+    """
+    Combine the results for the parts of a split snippet. Each score is the worst part's score.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    issues = [issue for part in parts for issue in part.issues]
+    return AnalysisResult(
+        has_issues=bool(issues),
+        issues=issues,
+        code_quality_score=min(part.code_quality_score for part in parts),
+        security_score=min(part.security_score for part in parts),
+        performance_score=min(part.performance_score for part in parts)
+    )
+
+
+def _parse_error_result(e: ValueError) -> Dict:
+    """
+    Build the all-zero result returned when a Gemini response cannot be parsed.
+    """
+    return {
+        "error": f"Could not parse Gemini response: {str(e)}",
+        "has_issues": False,
+        "issues": [],
+        "code_quality_score": 0,
+        "security_score": 0,
+        "performance_score": 0
+    }
+
+
+def _error_result(e: Exception) -> Dict:
+    """
+    Build the all-zero result returned when a Gemini call fails.
+    """
+    error_msg = str(e)
+    # Check if it's a quota exceeded error
+    if "429" in error_msg or "quota" in error_msg.lower() or "rate limit" in error_msg.lower():
+        error = f"API quota exceeded. Please check your billing details. {error_msg}"
+    else:
+        error = f"Error calling Gemini API: {error_msg}"
+    return {
+        "error": error,
+        "has_issues": False,
+        "issues": [],
+        "code_quality_score": 0,
+        "security_score": 0,
+        "performance_score": 0
+    }
@@ -0,0 +1,161 @@
+import ast
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .chunking import LANGUAGE_BY_EXTENSION, detect_language
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def _git(repo: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", repo] + list(args),
+        check=True, capture_output=True, text=True, encoding='utf-8', errors='replace'
+    ).stdout
+
+
+def changed_lines(repo: str, base: str, head: str) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Return the changed line ranges of each file in head, relative to base.
+    Pure deletions are reported as the line just before the removed block.
+    """
+    diff = _git(repo, "diff", "--unified=0", "--no-color", "--no-ext-diff", "-M", base, head)
+    changes = {}
+    current = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            path = line[4:]
+            current = path[2:] if path.startswith("b/") else None
+            if current is not None:
+                changes.setdefault(current, [])
+            continue
+        match = _HUNK_HEADER.match(line)
+        if match and current is not None:
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            if count == 0:
+                start = max(start, 1)
+                changes[current].append((start, start))
+            else:
+                changes[current].append((start, start + count - 1))
+    return {path: ranges for path, ranges in changes.items() if ranges}
+
+
+def file_at_revision(repo: str, revision: str, path: str) -> str:
+    """
+    Return the contents of path at revision.
+    """
+    return _git(repo, "show", f"{revision}:{path}")
+
+
+def _definition_spans(code: str) -> List[Tuple[int, int]]:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    spans = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            spans.append((start, node.end_lineno))
+    return spans
+
+
+def expand_to_regions(code: str, language: str, ranges: List[Tuple[int, int]],
+                      context: int = 3) -> List[Tuple[int, int]]:
+    """
+    Expand changed line ranges to their enclosing function or class. Changes outside any
+    definition (or in non-Python files) get context lines on each side. Overlapping regions are merged.
+    """
+    total_lines = len(code.splitlines())
+    spans = _definition_spans(code) if language == "python" else []
+    regions = []
+    for start, end in ranges:
+        containing = [span for span in spans if span[0] <= start and end <= span[1]]
+        if containing:
+            regions.append(min(containing, key=lambda span: span[1] - span[0]))
+            continue
+
+        region_start, region_end = start, end
+        partial = [span for span in spans if span[0] <= region_end and region_start <= span[1]]
+        if partial:
+            # The change straddles several definitions; cover each of them completely
+            region_start = min([region_start] + [span[0] for span in partial])
+            region_end = max([region_end] + [span[1] for span in partial])
+        else:
+            region_start = max(1, start - context)
+            region_end = end + context
+        regions.append((region_start, min(region_end, total_lines)))
+
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [(start, end) for start, end in merged if start <= end]
+
+
+class DiffAnalyzer:
+    """
+    Analyzes only the functions and classes touched between two git revisions.
+    """
+
+    def __init__(self, analyze_fn: Callable[[str], Dict], max_workers: int = 4, context: int = 3,
+                 extensions: Optional[Set[str]] = None):
+        self.analyze_fn = analyze_fn
+        self.max_workers = max_workers
+        self.context = context
+        self.extensions = extensions if extensions is not None else set(LANGUAGE_BY_EXTENSION)
+
+    def analyze(self, repo: str, base: str, head: str) -> Dict:
+        """
+        Analyze the regions changed from base to head. Line numbers refer to head.
+        """
+        try:
+            changes = changed_lines(repo, base, head)
+            jobs = []
+            for path, ranges in changes.items():
+                if os.path.splitext(path)[1].lower() not in self.extensions:
+                    continue
+                code = file_at_revision(repo, head, path)
+                lines = code.splitlines(keepends=True)
+                for start, end in expand_to_regions(code, detect_language(path), ranges, self.context):
+                    jobs.append((path, start, end, ''.join(lines[start - 1:end])))
+        except (subprocess.CalledProcessError, OSError) as e:
+            stderr = getattr(e, 'stderr', '') or str(e)
+            return {"error": f"Error reading git diff: {stderr.strip()}"}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            results = list(executor.map(lambda job: self.analyze_fn(job[3]), jobs))
+
+        files = {}
+        failed = 0
+        for (path, start, end, _), result in zip(jobs, results):
+            report = files.setdefault(path, {"path": path, "regions": [], "bugs": [], "errors": []})
+            report["regions"].append([start, end])
+            if 'error' in result:
+                report["errors"].append(f"Lines {start}-{end}: {result['error']}")
+                failed += 1
+                continue
+            for bug in result.get('bugs', []):
+                bug = dict(bug)
+                if isinstance(bug.get('line_number'), int):
+                    bug['line_number'] += start - 1
+                report["bugs"].append(bug)
+
+        for report in files.values():
+            report["has_bugs"] = bool(report["bugs"])
+            if not report["errors"]:
+                del report["errors"]
+
+        return {
+            "base": base,
+            "head": head,
+            "has_bugs": any(report["has_bugs"] for report in files.values()),
+            "regions_analyzed": len(jobs),
+            "regions_failed": failed,
+            "files": list(files.values())
+        }
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from .chunking import detect_language, estimate_tokens, leading_blank_lines, split_definitions
+
+
+class IncrementalAnalyzer:
+    """
+    Re-analyzes only the top-level definitions of a file that changed since the last run.
+    Per-definition results are kept in a manifest keyed by a fingerprint of each definition's source.
+    Changed definitions are packed into requests of at most max_tokens and the results split back out.
+    """
+
+    def __init__(self, analyze_fn: Callable[[str], Dict], manifest_dir: str = '.bug_detector_manifests',
+                 max_workers: int = 4, max_tokens: int = 2000):
+        self.analyze_fn = analyze_fn
+        self.manifest_dir = manifest_dir
+        self.max_workers = max_workers
+        self.max_tokens = max_tokens
+
+    def fingerprint(self, source: str) -> str:
+        """
+        Hash a definition's source, ignoring surrounding blank lines and trailing whitespace.
+        """
+        normalized = '\n'.join(line.rstrip() for line in source.strip('\n').splitlines())
+        return hashlib.sha256(normalized.strip().encode('utf-8')).hexdigest()
+
+    def analyze_file(self, file_path: str, code: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> Optional[Dict]:
+        """
+        Analyze a file, reusing stored results for unchanged definitions.
+        Returns None when the file cannot be split into definitions, so the caller can fall back
+        to a full analysis.
+        """
+        if code is None:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                code = file.read()
+
+        segments = split_definitions(code, detect_language(file_path))
+        if not segments:
+            return None
+
+        manifest = self._load_manifest(file_path)
+        fingerprints = [self.fingerprint(segment.text) for segment in segments]
+        changed = {}
+        for segment, fingerprint in zip(segments, fingerprints):
+            if fingerprint not in manifest and fingerprint not in changed:
+                changed[fingerprint] = segment
+
+        batches = self._pack(list(changed.items()), max_tokens or self.max_tokens)
+        fresh = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            for batch_results in executor.map(self._analyze_batch, batches):
+                fresh.update(batch_results)
+
+        bugs = []
+        errors = []
+        weighted_score = 0
+        scored_lines = 0
+        new_manifest = {}
+        for segment, fingerprint in zip(segments, fingerprints):
+            entry = manifest.get(fingerprint)
+            if entry is None:
+                result = fresh[fingerprint]
+                if 'error' in result:
+                    errors.append(f"Lines {segment.start_line}-{segment.end_line}: {result['error']}")
+                    continue
+                entry = result
+            new_manifest[fingerprint] = entry
+
+            offset = segment.start_line - 1 + leading_blank_lines(segment.text)
+            bugs.extend(self._shift_lines(entry["bugs"], offset))
+            lines = segment.end_line - segment.start_line + 1
+            weighted_score += entry["overall_score"] * lines
+            scored_lines += lines
+
+        self._save_manifest(file_path, new_manifest)
+
+        bugs.sort(key=lambda bug: bug['line_number'] if isinstance(bug.get('line_number'), int) else 0)
+        result = {
+            "has_bugs": bool(bugs),
+            "bugs": bugs,
+            "overall_score": round(weighted_score / scored_lines) if scored_lines else 0,
+            "definitions_analyzed": len(changed),
+            "requests": len(batches),
+            "definitions_reused": len(segments) - sum(
+                1 for fingerprint in fingerprints if fingerprint in changed
+            )
+        }
+        if errors:
+            result["chunk_errors"] = errors
+            if not scored_lines:
+                result["error"] = errors[0]
+        return result
+
+    def _pack(self, changed: List, max_tokens: int) -> List[List]:
+        """
+        Group (fingerprint, segment) pairs, in file order, into batches that fit max_tokens.
+        A definition larger than the budget is sent on its own.
+        """
+        batches = []
+        batch_tokens = 0
+        for fingerprint, segment in changed:
+            tokens = estimate_tokens(_strip_leading_blank_lines(segment.text))
+            if batches and batch_tokens + tokens <= max_tokens:
+                batches[-1].append((fingerprint, segment))
+                batch_tokens += tokens
+            else:
+                batches.append([(fingerprint, segment)])
+                batch_tokens = tokens
+        return batches
+
+    def _analyze_batch(self, batch: List) -> Dict[str, Dict]:
+        """
+        Analyze a batch of definitions in one request and split the result per definition.
+        Line numbers are stored relative to the first non-blank line of each definition.
+        """
+        parts = []
+        starts = []
+        line = 1
+        for _, segment in batch:
+            text = _strip_leading_blank_lines(segment.text)
+            if not text.endswith('\n'):
+                text += '\n'
+            starts.append(line)
+            parts.append(text)
+            line += text.count('\n') + 1
+        result = self.analyze_fn('\n'.join(parts))
+        if 'error' in result:
+            return {fingerprint: result for fingerprint, _ in batch}
+
+        bugs = [[] for _ in batch]
+        for bug in result.get('bugs', []):
+            line_number = bug.get('line_number')
+            index = 0
+            if isinstance(line_number, int):
+                # The last definition starting at or before the reported line
+                index = max(bisect_right(starts, line_number) - 1, 0)
+                line_number -= starts[index] - 1
+            bugs[index].append(dict(bug, line_number=line_number))
+        return {
+            fingerprint: {"bugs": definition_bugs, "overall_score": result.get('overall_score', 0)}
+            for (fingerprint, _), definition_bugs in zip(batch, bugs)
+        }
+
+    def _shift_lines(self, bugs, offset: int):
+        shifted = []
+        for bug in bugs:
+            bug = dict(bug)
+            if isinstance(bug.get('line_number'), int):
+                bug['line_number'] += offset
+            shifted.append(bug)
+        return shifted
+
+    def _manifest_path(self, file_path: str) -> str:
+        digest = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.manifest_dir, f"{digest}.json")
+
+    def _load_manifest(self, file_path: str) -> Dict:
+        try:
+            with open(self._manifest_path(file_path), 'r', encoding='utf-8') as file:
+                return json.load(file).get("definitions", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_manifest(self, file_path: str, definitions: Dict):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        path = self._manifest_path(file_path)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"file_path": os.path.abspath(file_path), "definitions": definitions}, file)
+        os.replace(temp_path, path)
+
+
+def _strip_leading_blank_lines(source: str) -> str:
+    return ''.join(source.splitlines(keepends=True)[leading_blank_lines(source):])
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue is at its depth limit.
+    """
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a bounded pool of background worker threads.
+    Finished jobs are kept for ttl_seconds so their results can be polled.
+    """
+
+    def __init__(self, worker_fn: Callable, max_workers: int = 4, max_queue_depth: int = 32,
+                 ttl_seconds: int = 600):
+        self.worker_fn = worker_fn
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def submit(self, *args) -> str:
+        """
+        Queue a job and return its id. Raises QueueFullError when the queue is full.
+        """
+        self._start_workers()
+        self._expire()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+        try:
+            self._queue.put_nowait((job_id, args))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise QueueFullError("Analysis queue is full, please retry later")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return a snapshot of a job, or None if it is unknown or has expired.
+        """
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def get_stats(self) -> Dict:
+        """
+        Return queue depth and job counts by status.
+        """
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._queue.maxsize,
+            "workers": self.max_workers,
+            "jobs": counts
+        }
+
+    def _start_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            job_id, args = self._queue.get()
+            with self._lock:
+                self._jobs[job_id]["status"] = "running"
+            try:
+                result = self.worker_fn(*args)
+                update = {"status": "done", "result": result}
+            except Exception as e:
+                update = {"status": "failed", "error": str(e)}
+            update["finished_at"] = time.time()
+            with self._lock:
+                self._jobs[job_id].update(update)
+            self._queue.task_done()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SlotPool:
+    """
+    Caps how many long-running requests, such as analysis streams, hold a server thread at once.
+    """
+
+    def __init__(self, max_slots: int = 4, retry_after: int = 5):
+        self.max_slots = max_slots
+        self.retry_after = retry_after
+        self._in_use = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a slot without waiting. Raises QueueFullError when all slots are in use.
+        """
+        with self._lock:
+            if self._in_use >= self.max_slots:
+                self._rejected += 1
+                raise QueueFullError("Too many analyses in progress, please retry later", self.retry_after)
+            self._in_use += 1
+
+    def release(self):
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"in_use": self._in_use, "max_slots": self.max_slots, "rejected": self._rejected}
@@ -0,0 +1,227 @@
+import ast
+import io
+import os
+import re
+import textwrap
+import tokenize
+from math import gcd
+from typing import Dict, List, Optional
+
+from .chunking import chunk_source, estimate_tokens
+
+# Prefixes of whole-line comments in languages other than Python
+_LINE_COMMENTS = {
+    'javascript': '//', 'typescript': '//', 'java': '//', 'c': '//', 'cpp': '//', 'csharp': '//',
+    'go': '//', 'rust': '//', 'kotlin': '//', 'swift': '//', 'php': '//', 'ruby': '#'
+}
+_BLOCK_COMMENT_LANGUAGES = {
+    'javascript', 'typescript', 'java', 'c', 'cpp', 'csharp', 'go', 'rust', 'kotlin', 'swift', 'php'
+}
+_LICENSE = re.compile(r"licen[cs]e|copyright|spdx-license-identifier|all rights reserved", re.IGNORECASE)
+
+
+def render_prompt(template: str, **values) -> str:
+    """
+    Dedent a prompt template and fill in its placeholders. Dedenting first keeps the
+    indentation of inserted code intact and drops the template's own indentation; trailing
+    newlines of inserted text are dropped so they do not pad the prompt.
+    """
+    values = {key: value.rstrip('\n') if isinstance(value, str) else value for key, value in values.items()}
+    return textwrap.dedent(template).strip().format(**values)
+
+
+class CompactCode:
+    """
+    Code with low-value content removed, plus the original line number of every remaining line.
+    """
+
+    __slots__ = ('text', 'line_map')
+
+    def __init__(self, text: str, line_map: List[int]):
+        self.text = text
+        self.line_map = line_map
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def original_line(self, line_number: Optional[int]) -> Optional[int]:
+        """
+        Map a line number in the compacted text back to the original code.
+        Out-of-range numbers are clamped to the nearest kept line.
+        """
+        if not isinstance(line_number, int) or isinstance(line_number, bool) or not self.line_map:
+            return line_number
+        return self.line_map[min(max(line_number, 1), len(self.line_map)) - 1]
+
+    def remap_issues(self, issues: List) -> List:
+        """
+        Rewrite the line numbers of Issue objects or issue dicts in place and return them.
+        """
+        for issue in issues:
+            if isinstance(issue, dict):
+                issue['line_number'] = self.original_line(issue.get('line_number'))
+            else:
+                issue.line_number = self.original_line(issue.line_number)
+        return issues
+
+
+def compact_code(code: str, language: str = "python") -> CompactCode:
+    """
+    Strip license headers, comments, blank lines and trailing whitespace, and shrink
+    indentation to one space per level. Line structure is otherwise preserved.
+    """
+    lines = code.splitlines()
+    if language == "python":
+        removed, comment_columns = _python_comments(code)
+    else:
+        removed, comment_columns = _line_comments(lines, language), {}
+
+    kept = []
+    for number, line in enumerate(lines, 1):
+        if number in removed:
+            continue
+        if number in comment_columns:
+            line = line[:comment_columns[number]]
+        line = line.rstrip()
+        if line.strip():
+            kept.append((number, line))
+
+    unit = _indent_unit([line for _, line in kept])
+    if unit > 1:
+        kept = [(number, ' ' * ((len(line) - len(line.lstrip(' '))) // unit) + line.lstrip(' '))
+                for number, line in kept]
+    text = ''.join(line + '\n' for _, line in kept)
+    return CompactCode(text, [number for number, _ in kept])
+
+
+def _python_comments(code: str):
+    """
+    Return the lines to drop entirely (comment-only lines and a license docstring) and the
+    column where a trailing comment starts on other lines.
+    """
+    removed = set()
+    columns = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT:
+                row, column = token.start
+                if token.line[:column].strip():
+                    columns[row] = column
+                else:
+                    removed.add(row)
+        tree = ast.parse(code)
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        # Not valid Python: only blank lines and trailing whitespace are removed
+        return set(), {}
+
+    docstring = ast.get_docstring(tree, clean=False)
+    if docstring and _LICENSE.search(docstring):
+        node = tree.body[0]
+        removed.update(range(node.lineno, node.end_lineno + 1))
+    return removed, columns
+
+
+def _line_comments(lines: List[str], language: str) -> set:
+    prefix = _LINE_COMMENTS.get(language)
+    block = language in _BLOCK_COMMENT_LANGUAGES
+    removed = set()
+    start = None
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if start is not None:
+            if '*/' in stripped:
+                # Only drop blocks that end the line; otherwise the rest is code
+                if stripped.endswith('*/'):
+                    removed.update(range(start, number + 1))
+                start = None
+            continue
+        if block and stripped.startswith('/*'):
+            if stripped.endswith('*/') and len(stripped) > 3:
+                removed.add(number)
+            elif '*/' not in stripped:
+                start = number
+            continue
+        if prefix and stripped.startswith(prefix):
+            removed.add(number)
+    return removed
+
+
+def _indent_unit(lines: List[str]) -> int:
+    if any(line[:len(line) - len(line.lstrip())].count('\t') for line in lines):
+        return 1
+    unit = 0
+    for line in lines:
+        unit = gcd(unit, len(line) - len(line.lstrip(' ')))
+    return unit or 1
+
+
+class PromptBuilder:
+    """
+    Builds token-bounded prompts from code: compacts it, then splits it (for analysis)
+    or truncates it (for free-text answers) to fit the per-request budget.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, compact: Optional[bool] = None):
+        if max_tokens is None:
+            max_tokens = int(os.getenv('BUG_DETECTOR_PROMPT_MAX_TOKENS', '8000'))
+        if compact is None:
+            compact = os.getenv('BUG_DETECTOR_PROMPT_COMPACT', '1').lower() not in ('0', 'false', 'no')
+        self.max_tokens = max_tokens
+        self.compact_enabled = compact
+
+    def compact(self, code: str, language: str = "python") -> CompactCode:
+        """
+        Compact code, falling back to the original when compaction is disabled or leaves nothing.
+        """
+        if self.compact_enabled:
+            compacted = compact_code(code, language)
+            if compacted.text:
+                return compacted
+        lines = code.splitlines()
+        return CompactCode(''.join(line + '\n' for line in lines), list(range(1, len(lines) + 1)))
+
+    def split(self, code: str, language: str = "python", overhead_tokens: int = 0) -> List[CompactCode]:
+        """
+        Compact code and split it into parts that each fit the budget next to overhead_tokens
+        of prompt text. Every part keeps its own map to the original line numbers.
+        """
+        compacted = self.compact(code, language)
+        budget = max(1, self.max_tokens - overhead_tokens)
+        if compacted.tokens <= budget:
+            return [compacted]
+        return [
+            CompactCode(chunk.text, compacted.line_map[chunk.start_line - 1:chunk.end_line])
+            for chunk in chunk_source(compacted.text, language, budget)
+        ]
+
+    def fit(self, code: str, language: str = "python", max_tokens: Optional[int] = None) -> str:
+        """
+        Compact code and truncate it to max_tokens (default: the whole budget), marking the cut.
+        """
+        text = self.compact(code, language).text
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        if estimate_tokens(text) <= budget:
+            return text
+
+        lines = text.splitlines(keepends=True)
+        kept = []
+        used = 0
+        for line in lines:
+            # Reserve a little room for the truncation marker
+            if used + estimate_tokens(line) > budget - 10:
+                break
+            kept.append(line)
+            used += estimate_tokens(line)
+        return ''.join(kept) + f"... ({len(lines) - len(kept)} more lines truncated)\n"
+
+    def stats(self, code: str, language: str = "python") -> Dict:
+        """
+        Compare the estimated token counts of the original and compacted code.
+        """
+        compacted = self.compact(code, language)
+        return {
+            "original_tokens": estimate_tokens(code),
+            "compacted_tokens": compacted.tokens,
+            "lines_kept": len(compacted.line_map)
+        }
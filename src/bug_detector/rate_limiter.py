@@ -0,0 +1,203 @@
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class QuotaExceededError(Exception):
+    """
+    Raised when the local request budget is exhausted.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Client-side token-bucket limiter with per-minute and per-day request budgets.
+    """
+
+    def __init__(self, requests_per_minute: int = 10, requests_per_day: int = 20):
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+
+        self._minute_tokens = float(requests_per_minute)
+        self._day_tokens = float(requests_per_day)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Take one request from both budgets, waiting for the minute bucket to refill if needed.
+        Raises QuotaExceededError when the daily budget is empty or the wait would exceed timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._day_tokens < 1:
+                    wait = (1 - self._day_tokens) * 86400.0 / self.requests_per_day
+                    raise QuotaExceededError(
+                        "Local quota exhausted: daily request budget is used up", retry_after=wait
+                    )
+                if now >= self._paused_until and self._minute_tokens >= 1:
+                    self._minute_tokens -= 1
+                    self._day_tokens -= 1
+                    return
+                wait = max(
+                    self._paused_until - now,
+                    (1 - self._minute_tokens) * 60.0 / self.requests_per_minute
+                )
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise QuotaExceededError(
+                    "Local quota exhausted: per-minute request budget is used up", retry_after=wait
+                )
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Hold back all callers for the given number of seconds, e.g. after a 429 response.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def exhaust_day(self):
+        """
+        Mark the daily budget as used up, e.g. after the server reports a per-day quota error.
+        """
+        with self._lock:
+            self._day_tokens = 0.0
+
+    def remaining(self) -> Dict:
+        """
+        Return how many requests can still be submitted this minute and this day.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "minute": int(self._minute_tokens),
+                "day": int(self._day_tokens),
+                "paused_for": max(0.0, self._paused_until - now)
+            }
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._minute_tokens = min(
+            float(self.requests_per_minute),
+            self._minute_tokens + elapsed * self.requests_per_minute / 60.0
+        )
+        self._day_tokens = min(
+            float(self.requests_per_day),
+            self._day_tokens + elapsed * self.requests_per_day / 86400.0
+        )
+
+
+_RETRY_PATTERNS = [
+    re.compile(r"retry in ([0-9.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*([0-9]+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([0-9.]+)", re.IGNORECASE),
+]
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Check whether an exception is a 429 / quota / rate-limit error.
+    """
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """
+    Extract a retry-after hint in seconds from an API error, if present.
+    """
+    for attribute in ("retry_after", "retry_delay"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, (int, float)):
+            return float(value)
+        seconds = getattr(value, "total_seconds", None)
+        if callable(seconds):
+            return float(seconds())
+
+    message = str(error)
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def call_with_retry(func: Callable, limiter: RateLimiter, max_retries: int = 3,
+                    base_delay: float = 1.0, max_delay: float = 60.0,
+                    acquire_timeout: Optional[float] = None):
+    """
+    Call func under the rate limiter, retrying quota errors with jittered exponential backoff.
+    A retry-after hint from the server takes precedence over the computed delay.
+    The limiter stays paused after the last failed attempt so other callers back off too.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire(acquire_timeout)
+        try:
+            return func()
+        except Exception as e:
+            if not is_quota_error(e) or isinstance(e, QuotaExceededError):
+                raise
+            if "perday" in str(e).lower().replace(" ", ""):
+                # Daily quota is gone on the server side; retrying only wastes time
+                limiter.exhaust_day()
+                raise
+
+            hint = parse_retry_after(e)
+            if hint is not None:
+                delay = hint + random.uniform(0, base_delay)
+            else:
+                delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            limiter.pause(delay)
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+
+
+_default_limiter = None
+_model_limiters: Dict[str, RateLimiter] = {}
+_default_limiter_lock = threading.Lock()
+
+
+def default_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide limiter configured through environment variables.
+    """
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = _limiter_from_environment()
+        return _default_limiter
+
+
+def model_rate_limiter(model_name: str) -> RateLimiter:
+    """
+    Return the process-wide limiter for a fallback model tier, creating it on first use.
+    Each model has its own budget, shared by every registry in the process.
+    """
+    with _default_limiter_lock:
+        limiter = _model_limiters.get(model_name)
+        if limiter is None:
+            limiter = _model_limiters[model_name] = _limiter_from_environment()
+        return limiter
+
+
+def _limiter_from_environment() -> RateLimiter:
+    return RateLimiter(
+        requests_per_minute=int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '10')),
+        requests_per_day=int(os.getenv('GEMINI_REQUESTS_PER_DAY', '20'))
+    )
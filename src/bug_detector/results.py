@@ -0,0 +1,195 @@
+import json
+import re
+from typing import Dict, Iterator, List, Optional
+
+SEVERITIES = ("critical", "high", "medium", "low")
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_INTEGER = re.compile(r"-?\d+")
+_JSON_START = re.compile(r"[{\[]")
+
+_ISSUE_FIELDS = ("type", "description", "severity", "line_number", "suggestion", "confidence")
+_RESULT_FIELDS = ("has_issues", "issues", "code_quality_score", "security_score", "performance_score", "error")
+
+
+def _coerce_int(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, str):
+        match = _INTEGER.search(value)
+        if match:
+            return int(match.group())
+    return None
+
+
+def _coerce_score(value) -> int:
+    score = _coerce_int(value)
+    if score is None:
+        return 0
+    return min(100, max(0, score))
+
+
+class Issue:
+    """
+    A single issue found in analyzed code.
+    """
+
+    __slots__ = ("type", "description", "severity", "line_number", "suggestion", "confidence", "extra")
+
+    def __init__(self, type: str, description: str = "", severity: str = "medium",
+                 line_number: Optional[int] = None, suggestion: str = "", confidence: int = 0,
+                 extra: Optional[Dict] = None):
+        self.type = type
+        self.description = description
+        self.severity = severity
+        self.line_number = line_number
+        self.suggestion = suggestion
+        self.confidence = confidence
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Issue":
+        """
+        Build an issue from loosely-typed model output, coercing invalid fields.
+        """
+        severity = str(data.get("severity", "medium")).strip().lower()
+        line_number = _coerce_int(data.get("line_number"))
+        extra = {key: value for key, value in data.items() if key not in _ISSUE_FIELDS}
+        return cls(
+            type=str(data.get("type") or "unknown"),
+            description=str(data.get("description") or ""),
+            severity=severity if severity in SEVERITIES else "medium",
+            line_number=line_number if line_number is not None and line_number > 0 else None,
+            suggestion=str(data.get("suggestion") or ""),
+            confidence=_coerce_score(data.get("confidence")),
+            extra=extra or None
+        )
+
+    def to_dict(self) -> Dict:
+        data = {
+            "type": self.type,
+            "description": self.description,
+            "severity": self.severity,
+            "line_number": self.line_number,
+            "suggestion": self.suggestion,
+            "confidence": self.confidence
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class AnalysisResult:
+    """
+    The analysis of one piece of code: its issues and quality scores.
+    """
+
+    __slots__ = ("has_issues", "issues", "code_quality_score", "security_score", "performance_score",
+                 "error", "extra")
+
+    def __init__(self, has_issues: bool = False, issues: Optional[List[Issue]] = None,
+                 code_quality_score: int = 0, security_score: int = 0, performance_score: int = 0,
+                 error: Optional[str] = None, extra: Optional[Dict] = None):
+        self.has_issues = has_issues
+        self.issues = issues if issues is not None else []
+        self.code_quality_score = code_quality_score
+        self.security_score = security_score
+        self.performance_score = performance_score
+        self.error = error
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "AnalysisResult":
+        """
+        Build a result from loosely-typed model output, coercing invalid fields.
+        """
+        raw_issues = data.get("issues")
+        issues = [Issue.from_dict(issue) for issue in raw_issues if isinstance(issue, dict)] \
+            if isinstance(raw_issues, list) else []
+        extra = {key: value for key, value in data.items() if key not in _RESULT_FIELDS}
+        error = data.get("error")
+        return cls(
+            has_issues=bool(issues) or data.get("has_issues") is True,
+            issues=issues,
+            code_quality_score=_coerce_score(data.get("code_quality_score")),
+            security_score=_coerce_score(data.get("security_score")),
+            performance_score=_coerce_score(data.get("performance_score")),
+            error=str(error) if error else None,
+            extra=extra or None
+        )
+
+    def to_dict(self) -> Dict:
+        data = {
+            "has_issues": self.has_issues,
+            "issues": [issue.to_dict() for issue in self.issues],
+            "code_quality_score": self.code_quality_score,
+            "security_score": self.security_score,
+            "performance_score": self.performance_score
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+
+def _json_values(text: str) -> Iterator:
+    """
+    Yield every top-level JSON object or array in a model response, looking inside markdown
+    fences first. Prose may contain brackets of its own, so every opening bracket is tried.
+    """
+    candidates = [match.group(1) for match in _FENCE.finditer(text)] + [text]
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        position = 0
+        for match in _JSON_START.finditer(candidate):
+            if match.start() < position:
+                continue
+            try:
+                value, position = decoder.raw_decode(candidate, match.start())
+            except ValueError:
+                continue
+            yield value
+
+
+def extract_json(text: str):
+    """
+    Decode the first JSON value in a model response, looking inside markdown fences first
+    and ignoring surrounding prose.
+    """
+    for value in _json_values(text):
+        return value
+    raise ValueError("No JSON found in response")
+
+
+def extract_json_object(text: str) -> Dict:
+    """
+    Decode the first JSON object in a model response, or the first object of an array,
+    skipping bracketed prose that happens to be valid JSON.
+    Raises ValueError when the response holds no object.
+    """
+    found = False
+    for value in _json_values(text):
+        found = True
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            value = value[0]
+        if isinstance(value, dict):
+            return value
+    if not found:
+        raise ValueError("No JSON found in response")
+    raise ValueError("Response JSON is not an analysis object")
+
+
+def parse_analysis_response(text: str) -> AnalysisResult:
+    """
+    Parse a Gemini analysis response into an AnalysisResult.
+    Raises ValueError when the response holds no analysis object.
+    """
+    return AnalysisResult.from_dict(extract_json_object(text))
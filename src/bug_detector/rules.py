@@ -0,0 +1,389 @@
+import ast
+import re
+from typing import Dict, Iterable, List, Optional
+
+SEVERITY_PENALTIES = {"critical": 30, "high": 20, "medium": 10, "low": 5}
+SECURITY_TYPES = {"code_injection"}
+
+# Parameter names that usually hold an integer position
+_INDEX_NAME = re.compile(r"^(?:[ijkn]|idx|index|pos|position|offset|.*_(?:idx|index|pos|offset))$")
+_MAPPING_ANNOTATION = re.compile(r"^(?:typing\.)?(?:dict|Dict|Mapping|MutableMapping|DefaultDict|OrderedDict)\b")
+
+
+def make_issue(issue_type: str, description: str, severity: str, line_number: int,
+               suggestion: str, confidence: int) -> Dict:
+    """
+    Build an issue dict in the same schema as the Gemini analysis.
+    """
+    return {
+        "type": issue_type,
+        "description": description,
+        "severity": severity,
+        "line_number": line_number,
+        "suggestion": suggestion,
+        "confidence": confidence,
+        "source": "local_rules"
+    }
+
+
+class _Scope:
+    __slots__ = ('params', 'annotations', 'guarded', 'handled', 'candidates')
+
+    def __init__(self, params=(), annotations=None):
+        self.params = set(params)
+        self.annotations = annotations or {}
+        self.guarded = set()
+        self.handled = set()
+        self.candidates = []
+
+
+class RuleContext:
+    """
+    Traversal state shared by all rules: the enclosing function scopes and the issues found so far.
+    """
+
+    def __init__(self):
+        self.scopes = [_Scope()]
+        self.issues = []
+
+    @property
+    def scope(self) -> _Scope:
+        return self.scopes[-1]
+
+    def is_param(self, name: str) -> bool:
+        return name in self.scope.params
+
+    def annotation(self, name: str) -> Optional[str]:
+        """
+        Return the source of a parameter's type annotation, if it has one.
+        """
+        return self.scope.annotations.get(name) if self.is_param(name) else None
+
+    def rebind(self, target: ast.AST):
+        """
+        Forget parameters rebound by an assignment, loop or with target: they no longer hold the argument.
+        """
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name):
+                self.scope.params.discard(node.id)
+
+    def report(self, issue: Dict):
+        """
+        Record an issue unconditionally.
+        """
+        self.issues.append(issue)
+
+    def report_unless_guarded(self, issue: Dict, names: Iterable[str], exceptions: Iterable[str]):
+        """
+        Record an issue unless the enclosing function tests one of names or catches one of exceptions.
+        The decision is made when the function has been fully traversed.
+        """
+        self.scope.candidates.append((issue, set(names), set(exceptions)))
+
+
+class Rule:
+    """
+    Base class for local rules. Subclasses list the AST node types they inspect in node_types
+    and implement check(), which reports issues through the context.
+    """
+
+    node_types = ()
+
+    def check(self, node: ast.AST, context: RuleContext):
+        raise NotImplementedError
+
+
+def _is_string_expression(node: ast.AST) -> bool:
+    """
+    Check whether an expression is a string or bytes literal, an f-string, or built from one
+    by concatenation or formatting.
+    """
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (str, bytes))
+    if isinstance(node, ast.JoinedStr):
+        return True
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mod)):
+        return _is_string_expression(node.left)
+    return False
+
+
+def _may_be_number(node: ast.AST) -> bool:
+    """
+    Check whether an expression could evaluate to a number; only obvious non-numbers are excluded.
+    """
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (int, float, complex)) and not isinstance(node.value, bool)
+    return not (_is_string_expression(node) or isinstance(
+        node, (ast.List, ast.Tuple, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)
+    ))
+
+
+def _guard_names(node: ast.AST) -> List[str]:
+    """
+    Return the names referenced by an expression, including names inside len() calls.
+    """
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'len' and node.args:
+        return _guard_names(node.args[0])
+    return []
+
+
+class DivisionByZeroRule(Rule):
+    node_types = (ast.BinOp, ast.AugAssign)
+
+    def check(self, node, context):
+        if not isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)):
+            return
+        dividend = node.left if isinstance(node, ast.BinOp) else node.target
+        if isinstance(node.op, ast.Mod) and not _may_be_number(dividend):
+            # '%' on a string is formatting, not a modulo
+            return
+        divisor = node.right if isinstance(node, ast.BinOp) else node.value
+        if isinstance(divisor, ast.Constant) and divisor.value == 0 and not isinstance(divisor.value, bool):
+            context.report(make_issue(
+                "division_by_zero", "Division by the constant zero always raises ZeroDivisionError",
+                "critical", node.lineno, "Remove the division or use a non-zero divisor", 95
+            ))
+            return
+
+        names = _guard_names(divisor)
+        if not names:
+            return
+        if isinstance(divisor, ast.Call):
+            description = f"Division by len({names[0]}) fails when {names[0]} is empty"
+            confidence = 75
+        elif context.is_param(names[0]):
+            description = f"Division by parameter '{names[0]}' is not guarded against zero"
+            confidence = 70
+        else:
+            return
+        context.report_unless_guarded(
+            make_issue("division_by_zero", description, "high", node.lineno,
+                       f"Check that {names[0]} is non-zero (or non-empty) before dividing", confidence),
+            names, ("ZeroDivisionError", "ArithmeticError")
+        )
+
+
+class IndexOutOfBoundsRule(Rule):
+    node_types = (ast.Subscript,)
+
+    def check(self, node, context):
+        if not isinstance(node.ctx, ast.Load) or not isinstance(node.value, ast.Name):
+            return
+        index = node.slice
+        sequence = node.value.id
+        if _MAPPING_ANNOTATION.match(context.annotation(sequence) or ""):
+            return
+        if isinstance(index, ast.Name) and context.is_param(index.id):
+            confidence = _index_confidence(index.id, context.annotation(index.id))
+            if confidence is None:
+                return
+            context.report_unless_guarded(
+                make_issue(
+                    "index_out_of_bounds",
+                    f"Index parameter '{index.id}' is used on '{sequence}' without a bounds check",
+                    "medium", node.lineno,
+                    f"Check that 0 <= {index.id} < len({sequence}) before indexing", confidence
+                ),
+                (index.id, sequence), ("IndexError", "LookupError")
+            )
+        elif (isinstance(index, ast.Constant) and isinstance(index.value, int)
+              and not isinstance(index.value, bool) and context.is_param(sequence)):
+            context.report_unless_guarded(
+                make_issue(
+                    "index_out_of_bounds",
+                    f"Parameter '{sequence}' is indexed at {index.value} without checking its length",
+                    "low", node.lineno, f"Check that {sequence} is long enough before indexing", 50
+                ),
+                (sequence,), ("IndexError", "LookupError")
+            )
+
+
+def _index_confidence(name: str, annotation: Optional[str]) -> Optional[int]:
+    """
+    Return the confidence that an index parameter is an integer position, or None if it is
+    annotated as something else (e.g. a dict key).
+    """
+    if annotation is not None:
+        return 65 if annotation == "int" else None
+    # Unannotated: keys such as 'key' or 'name' are more likely used on mappings
+    return 65 if _INDEX_NAME.match(name) else 40
+
+
+class BareExceptRule(Rule):
+    node_types = (ast.ExceptHandler,)
+
+    def check(self, node, context):
+        if node.type is None:
+            context.report(make_issue(
+                "bare_except", "Bare 'except:' also catches KeyboardInterrupt and SystemExit",
+                "low", node.lineno, "Catch specific exceptions, or at least 'except Exception:'", 90
+            ))
+
+
+class MutableDefaultArgumentRule(Rule):
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def check(self, node, context):
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                context.report(make_issue(
+                    "mutable_default_argument",
+                    f"Function '{node.name}' uses a mutable default argument shared between calls",
+                    "medium", default.lineno, "Default to None and create the object inside the function", 90
+                ))
+
+
+class EvalExecRule(Rule):
+    node_types = (ast.Call,)
+
+    def check(self, node, context):
+        if isinstance(node.func, ast.Name) and node.func.id in ('eval', 'exec'):
+            context.report(make_issue(
+                "code_injection", f"Call to {node.func.id}() can execute arbitrary code",
+                "high", node.lineno, "Avoid eval/exec; use ast.literal_eval or explicit parsing", 85
+            ))
+
+
+_TEST_NODES = (ast.If, ast.While, ast.IfExp, ast.Assert)
+# Nodes that bind names, with the attributes holding their targets
+_BINDING_TARGETS = {
+    ast.For: ('target',), ast.AsyncFor: ('target',), ast.comprehension: ('target',),
+    ast.Assign: ('targets',), ast.AnnAssign: ('target',), ast.NamedExpr: ('target',),
+    ast.withitem: ('optional_vars',),
+}
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+DEFAULT_RULES = (
+    DivisionByZeroRule,
+    IndexOutOfBoundsRule,
+    BareExceptRule,
+    MutableDefaultArgumentRule,
+    EvalExecRule,
+)
+
+
+class RuleEngine:
+    """
+    Runs a set of local rules over Python source in a single AST traversal.
+    """
+
+    def __init__(self, rules: Optional[List[Rule]] = None):
+        self._dispatch = {}
+        for rule in rules if rules is not None else [rule_class() for rule_class in DEFAULT_RULES]:
+            self.register(rule)
+
+    def register(self, rule: Rule):
+        """
+        Add a rule to the engine.
+        """
+        for node_type in rule.node_types:
+            self._dispatch.setdefault(node_type, []).append(rule)
+
+    def analyze(self, code: str) -> Optional[List[Dict]]:
+        """
+        Return the issues found in code, or None if it is not valid Python.
+        """
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+
+        context = RuleContext()
+        self._visit(tree, context)
+        self._close_scope(context)
+        context.issues.sort(key=lambda issue: issue["line_number"])
+        return context.issues
+
+    def _visit(self, node: ast.AST, context: RuleContext):
+        node_type = type(node)
+        rules = self._dispatch.get(node_type)
+        if rules:
+            for rule in rules:
+                rule.check(node, context)
+
+        scope = context.scope
+        if node_type is ast.Compare:
+            for operand in [node.left] + node.comparators:
+                scope.guarded.update(_guard_names(operand))
+        elif node_type in _TEST_NODES:
+            test = node.test.operand if isinstance(node.test, ast.UnaryOp) else node.test
+            operands = test.values if isinstance(test, ast.BoolOp) else [test]
+            for operand in operands:
+                scope.guarded.update(_guard_names(operand))
+        elif node_type is ast.ExceptHandler:
+            scope.handled.update(_exception_names(node.type))
+        elif node_type in _BINDING_TARGETS:
+            for attribute in _BINDING_TARGETS[node_type]:
+                targets = getattr(node, attribute)
+                for target in targets if isinstance(targets, list) else [targets]:
+                    if target is not None:
+                        context.rebind(target)
+
+        if node_type in _FUNCTION_NODES:
+            args = node.args
+            params = args.posonlyargs + args.args + args.kwonlyargs
+            annotations = {arg.arg: ast.unparse(arg.annotation) for arg in params if arg.annotation is not None}
+            context.scopes.append(_Scope([arg.arg for arg in params], annotations))
+            for child in ast.iter_child_nodes(node):
+                self._visit(child, context)
+            self._close_scope(context)
+            context.scopes.pop()
+        else:
+            for child in ast.iter_child_nodes(node):
+                self._visit(child, context)
+
+    def _close_scope(self, context: RuleContext):
+        scope = context.scope
+        catches_all = bool(scope.handled & {"*", "Exception", "BaseException"})
+        for issue, names, exceptions in scope.candidates:
+            if catches_all or names & scope.guarded or exceptions & scope.handled:
+                continue
+            context.issues.append(issue)
+        scope.candidates = []
+
+
+def _exception_names(node: Optional[ast.AST]) -> List[str]:
+    if node is None:
+        return ["*"]
+    if isinstance(node, ast.Tuple):
+        return [name for element in node.elts for name in _exception_names(element)]
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Attribute):
+        return [node.attr]
+    return []
+
+
+def local_result(issues: List[Dict]) -> Dict:
+    """
+    Build a full analysis result from local rule issues alone.
+    """
+    quality_penalty = sum(SEVERITY_PENALTIES.get(issue["severity"], 0) for issue in issues)
+    security_penalty = sum(
+        SEVERITY_PENALTIES.get(issue["severity"], 0) for issue in issues if issue["type"] in SECURITY_TYPES
+    )
+    return {
+        "has_issues": bool(issues),
+        "issues": list(issues),
+        "code_quality_score": max(0, 100 - quality_penalty),
+        "security_score": max(0, 100 - security_penalty),
+        "performance_score": 100,
+        "source": "local_rules"
+    }
+
+
+def merge_local_issues(result: Dict, issues: List[Dict]) -> Dict:
+    """
+    Add local rule issues to a model result, skipping ones the model already reported on the same line.
+    """
+    merged = dict(result)
+    existing = {
+        (str(issue.get("type", "")).lower().replace(" ", "_"), issue.get("line_number"))
+        for issue in result.get("issues", [])
+    }
+    extra = [issue for issue in issues if (issue["type"], issue["line_number"]) not in existing]
+    merged["issues"] = list(result.get("issues", [])) + extra
+    merged["has_issues"] = bool(result.get("has_issues")) or bool(extra)
+    return merged
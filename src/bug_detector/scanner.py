@@ -0,0 +1,230 @@
+import json
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from .chunking import LANGUAGE_BY_EXTENSION, detect_language
+
+
+class GitignoreRules:
+    """
+    Patterns from one .gitignore file, matched against paths relative to its directory.
+    """
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            directory_only = line.endswith('/')
+            line = line.rstrip('/')
+            # A slash at the start or in the middle anchors the pattern; a trailing one does not
+            anchored = '/' in line
+            self.rules.append((_glob_to_regex(line.lstrip('/'), anchored), negate, directory_only))
+
+    @classmethod
+    def load(cls, directory: str, base: str) -> Optional["GitignoreRules"]:
+        path = os.path.join(directory, '.gitignore')
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                return cls(base, file.readlines())
+        except OSError:
+            return None
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Return True if ignored, False if explicitly re-included, or None if no pattern applies.
+        """
+        if self.base:
+            if not relative_path.startswith(self.base + '/'):
+                return None
+            relative_path = relative_path[len(self.base) + 1:]
+        decision = None
+        for regex, negate, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                decision = not negate
+        return decision
+
+
+def _glob_to_regex(pattern: str, anchored: bool):
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                parts.append('[' + pattern[i + 1:end].replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    prefix = '' if anchored else '(?:.*/)?'
+    return re.compile(prefix + ''.join(parts) + '$')
+
+
+def walk_repository(root: str, extensions: Optional[Set[str]] = None) -> Iterator[str]:
+    """
+    Yield paths (relative to root, '/'-separated) of files that are not ignored by any .gitignore
+    and whose extension is in extensions. Directories are visited lazily in sorted order.
+    """
+    stack = [('', [])]
+    while stack:
+        relative_dir, rules = stack.pop()
+        directory = os.path.join(root, relative_dir) if relative_dir else root
+        own_rules = GitignoreRules.load(directory, relative_dir)
+        if own_rules is not None:
+            rules = rules + [own_rules]
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if entry.name == '.git' or _is_ignored(rules, relative_path, is_dir):
+                continue
+            if is_dir:
+                subdirectories.append(relative_path)
+            elif entry.is_file(follow_symlinks=False):
+                if extensions is None or os.path.splitext(entry.name)[1].lower() in extensions:
+                    yield relative_path
+        for relative_path in reversed(subdirectories):
+            stack.append((relative_path, rules))
+
+
+def _is_ignored(rules: List[GitignoreRules], relative_path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule_set in rules:
+        decision = rule_set.match(relative_path, is_dir)
+        if decision is not None:
+            ignored = decision
+    return ignored
+
+
+def skip_reason(path: str, max_file_bytes: int) -> Optional[str]:
+    """
+    Return why a file should not be analyzed (too large or binary), or None.
+    """
+    try:
+        if os.path.getsize(path) > max_file_bytes:
+            return "too_large"
+        with open(path, 'rb') as file:
+            if b'\0' in file.read(8192):
+                return "binary"
+    except OSError as e:
+        return f"unreadable: {e}"
+    return None
+
+
+class RepositoryScanner:
+    """
+    Scans a directory tree with bounded parallelism, streaming one JSONL record per file.
+    A checkpoint file lists finished paths so an interrupted scan can resume where it stopped.
+    """
+
+    def __init__(self, analyze_fn: Callable[[str], Dict], max_workers: int = 4,
+                 extensions: Optional[Set[str]] = None, max_file_bytes: int = 1024 * 1024):
+        self.analyze_fn = analyze_fn
+        self.max_workers = max_workers
+        self.extensions = extensions if extensions is not None else set(LANGUAGE_BY_EXTENSION)
+        self.max_file_bytes = max_file_bytes
+
+    def scan(self, root: str, output_path: str, checkpoint_path: Optional[str] = None,
+             resume: bool = True) -> Dict:
+        """
+        Scan root and append results to output_path. Stops early, without checkpointing the
+        affected files, when the model reports that the API quota is exhausted. Files where only
+        some chunks failed are neither written nor checkpointed, so a later run retries them.
+        """
+        checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+        finished = self._load_checkpoint(checkpoint_path) if resume else set()
+        mode = 'a' if resume else 'w'
+        summary = {"analyzed": 0, "skipped": 0, "errors": 0, "incomplete": 0, "already_done": 0, "stopped": None}
+
+        with open(output_path, mode, encoding='utf-8') as output, \
+                open(checkpoint_path, mode, encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            pending = set()
+            files = walk_repository(root, self.extensions)
+            exhausted = False
+            while True:
+                # Keep a bounded number of files in flight so memory stays flat
+                while not exhausted and summary["stopped"] is None and len(pending) < self.max_workers * 2:
+                    relative_path = next(files, None)
+                    if relative_path is None:
+                        exhausted = True
+                        break
+                    if relative_path in finished:
+                        summary["already_done"] += 1
+                        continue
+                    pending.add(executor.submit(self._scan_file, root, relative_path))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    relative_path, record = future.result()
+                    result = record.get("result", {})
+                    error = str(result.get("error", ""))
+                    chunk_errors = result.get("chunk_errors", [])
+                    if any("quota" in str(message).lower() for message in [error] + chunk_errors):
+                        summary["stopped"] = "quota_exhausted"
+                        continue
+                    if chunk_errors and not error:
+                        summary["incomplete"] += 1
+                        continue
+                    if "skipped" in record:
+                        summary["skipped"] += 1
+                    elif error:
+                        summary["errors"] += 1
+                    else:
+                        summary["analyzed"] += 1
+                    output.write(json.dumps(record) + '\n')
+                    output.flush()
+                    checkpoint.write(relative_path + '\n')
+                    checkpoint.flush()
+        return summary
+
+    def _scan_file(self, root: str, relative_path: str) -> Tuple[str, Dict]:
+        path = os.path.join(root, relative_path)
+        record = {"path": relative_path, "language": detect_language(path)}
+        reason = skip_reason(path, self.max_file_bytes)
+        if reason is not None:
+            record["skipped"] = reason
+            return relative_path, record
+        try:
+            record["result"] = self.analyze_fn(path)
+        except Exception as e:
+            record["result"] = {"error": f"Error analyzing file: {str(e)}"}
+        return relative_path, record
+
+    def _load_checkpoint(self, checkpoint_path: str) -> Set[str]:
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as file:
+                return {line.rstrip('\n') for line in file if line.strip()}
+        except FileNotFoundError:
+            return set()
@@ -0,0 +1,78 @@
+import json
+import re
+from typing import Dict, List
+
+_ISSUES_KEY = re.compile(r'"issues"\s*:\s*\[')
+
+
+class IssueStreamParser:
+    """
+    Incrementally parses a streamed analysis response and returns each entry of the
+    "issues" array as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self.finished = False
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Add a chunk of response text and return the issues it completed.
+        """
+        self.buffer += text
+        if self.finished:
+            return []
+        if self._pos is None:
+            match = _ISSUES_KEY.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        issues = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the issues array
+                    self.finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        issue = json.loads(buffer[self._object_start:i + 1])
+                    except ValueError:
+                        issue = None
+                    if isinstance(issue, dict):
+                        issues.append(issue)
+                    self._object_start = None
+            i += 1
+        self._pos = i
+        return issues
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """
+    Format one Server-Sent Events message.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
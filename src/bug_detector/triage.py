@@ -0,0 +1,95 @@
+import math
+import pickle
+from typing import Dict, List
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.utils import murmurhash3_32
+
+from .evaluation import EvaluationMetrics
+
+# Identifiers, numbers and individual punctuation characters
+TOKEN_PATTERN = r"[A-Za-z_][A-Za-z_0-9]*|\d+|[^\sA-Za-z_0-9]"
+
+
+class TriageModel:
+    """
+    Cheap local classifier that estimates the probability that a snippet has issues.
+    Used to skip remote analysis for confidently clean code and to order batch work by risk.
+    """
+
+    def __init__(self, n_features: int = 1 << 18):
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            token_pattern=TOKEN_PATTERN,
+            ngram_range=(1, 3),
+            lowercase=False,
+            alternate_sign=False
+        )
+        self.classifier = SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=50, tol=1e-4, random_state=0)
+        self.trained = False
+        self._analyzer = None
+        self._weights = None
+
+    def train(self, buggy_codes: List[str], fixed_codes: List[str]):
+        """
+        Fit the model on buggy (label 1) and fixed (label 0) code.
+        """
+        features = self.vectorizer.transform(list(buggy_codes) + list(fixed_codes))
+        labels = np.concatenate((np.ones(len(buggy_codes)), np.zeros(len(fixed_codes))))
+        self.classifier.fit(features, labels)
+        self.trained = True
+        self._analyzer = None
+
+    def predict_proba(self, codes: List[str]) -> np.ndarray:
+        """
+        Return the probability of issues for each snippet.
+        """
+        return self.classifier.predict_proba(self.vectorizer.transform(codes))[:, 1]
+
+    def probability(self, code: str) -> float:
+        """
+        Return the probability of issues for one snippet.
+        Computes the hashed features and the linear score directly, which avoids the
+        per-call validation overhead of the sklearn estimators for single snippets.
+        """
+        if self._analyzer is None:
+            self._analyzer = self.vectorizer.build_analyzer()
+            self._weights = self.classifier.coef_[0].tolist()
+        n_features = self.vectorizer.n_features
+        counts = {}
+        for term in self._analyzer(code):
+            index = abs(murmurhash3_32(term, seed=0)) % n_features
+            counts[index] = counts.get(index, 0) + 1
+        norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+        score = sum(self._weights[index] * count for index, count in counts.items()) / norm
+        score += float(self.classifier.intercept_[0])
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def evaluate(self, buggy_codes: List[str], fixed_codes: List[str], threshold: float = 0.5) -> Dict:
+        """
+        Score the model on labeled pairs with EvaluationMetrics.
+        """
+        probabilities = self.predict_proba(list(buggy_codes) + list(fixed_codes))
+        predictions = [{"has_issues": bool(p >= threshold)} for p in probabilities]
+        actual = [{"has_issues": True}] * len(buggy_codes) + [{"has_issues": False}] * len(fixed_codes)
+        return EvaluationMetrics().evaluate_system(predictions, actual)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_analyzer'] = None
+        state['_weights'] = None
+        return state
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            pickle.dump(self, file)
+
+    @classmethod
+    def load(cls, path: str) -> "TriageModel":
+        with open(path, 'rb') as file:
+            model = pickle.load(file)
+        if not isinstance(model, cls):
+            raise ValueError(f"{path} does not contain a TriageModel")
+        return model
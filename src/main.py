@@ -1,42 +1,28 @@
 # Bug Detection System - Main Implementation
 
+import argparse
+import json
 import os
-from dotenv import load_dotenv
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bug_detector.backends import default_registry
+from bug_detector.clients import load_environment
+from bug_detector.data_collector import DataCollector
+from bug_detector.chunking import chunk_source, detect_language
+from bug_detector.git_diff import DiffAnalyzer
+from bug_detector.incremental import IncrementalAnalyzer
+from bug_detector.prompting import render_prompt
+from bug_detector.results import AnalysisResult, extract_json_object
+from bug_detector.scanner import RepositoryScanner
 
-# Load environment variables
-load_dotenv()
-
-class BugDetector:
-    """
-    AI-driven bug detection system that uses Gemini API to identify potential bugs in code.
-    """
-
-    def __init__(self):
-        self.api_key = os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        # Initialize Gemini API client
-        import google.generativeai as genai
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-
-    def analyze_code(self, code_snippet):
-        """
-        Analyze a code snippet for potential bugs using Gemini AI.
-
-        Args:
-            code_snippet (str): The code to analyze
-
-        Returns:
-            dict: Analysis results containing potential bugs and suggestions
-        """
-        prompt = f"""
+ANALYSIS_PROMPT = """
         Analyze the following code for potential bugs, security vulnerabilities, and code quality issues.
         Provide specific details about what might be wrong and suggest fixes.
 
         Code:
-        {code_snippet}
+        {code}
 
         Please return your response in the following JSON format:
         {{
@@ -52,25 +38,40 @@ class BugDetector:
             ],
             "overall_score": 0-100 (higher is better code quality)
         }}
+
+        Line numbers are relative to the first line of the code above.
+        """
+
+
+class BugDetector:
+    """
+    AI-driven bug detection system that uses Gemini API to identify potential bugs in code.
+    """
+
+    def __init__(self, backends=None):
+        load_environment()
+        self.api_key = os.getenv('GEMINI_API_KEY')
+        if backends is None and not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        # Model tiers (Gemini by default, or e.g. a LocalBackend in tests)
+        self.backends = backends if backends is not None else default_registry()
+        self.incremental = IncrementalAnalyzer(lambda code: self._analyze_indexed(0, code))
+
+    def analyze_code(self, code_snippet):
+        """
+        Analyze a code snippet for potential bugs using Gemini AI.
+
+        Args:
+            code_snippet (str): The code to analyze
+
+        Returns:
+            dict: Analysis results containing potential bugs and suggestions
         """
+        prompt = render_prompt(ANALYSIS_PROMPT, code=code_snippet)
 
         try:
-            response = self.model.generate_content(prompt)
-            # In a real implementation, we would parse the JSON response
-            # For now, we'll return a mock response structure
-            return {
-                "has_bugs": True,
-                "bugs": [
-                    {
-                        "type": "Logic Error",
-                        "description": "Potential null pointer exception",
-                        "severity": "high",
-                        "line_number": 10,
-                        "suggestion": "Add null check before accessing object"
-                    }
-                ],
-                "overall_score": 75
-            }
+            response = self.backends.generate(prompt)
         except Exception as e:
             return {
                 "error": f"Error analyzing code: {str(e)}",
@@ -79,46 +80,177 @@ class BugDetector:
                 "overall_score": 0
             }
 
-    def predict_bugs_in_file(self, file_path):
+        try:
+            return self._parse_response(response.text)
+        except ValueError as e:
+            return {
+                "error": f"Could not parse model response: {str(e)}",
+                "has_bugs": False,
+                "bugs": [],
+                "overall_score": 0
+            }
+
+    def _parse_response(self, text):
+        """
+        Parse a model response into the has_bugs/bugs/overall_score schema.
+
+        Args:
+            text (str): The raw response text
+
+        Returns:
+            dict: The parsed analysis, with bug fields coerced to their expected types
+
+        Raises:
+            ValueError: If the response holds no analysis object
+        """
+        value = extract_json_object(text)
+        # Reuse the coercion of the typed results: bad severities, line numbers and scores are fixed up
+        parsed = AnalysisResult.from_dict({
+            "has_issues": value.get("has_bugs"),
+            "issues": value.get("bugs"),
+            "code_quality_score": value.get("overall_score")
+        })
+        return {
+            "has_bugs": parsed.has_issues,
+            "bugs": [bug.to_dict() for bug in parsed.issues],
+            "overall_score": parsed.code_quality_score
+        }
+
+    def predict_bugs_in_file(self, file_path, max_tokens=2000, max_workers=4, incremental=False):
         """
         Analyze an entire file for potential bugs.
 
+        Files larger than max_tokens are split at top-level function and class boundaries
+        (or into line windows for non-Python files) and the chunks are analyzed in parallel.
+        In incremental mode only top-level definitions that changed since the previous
+        incremental run are sent; results for unchanged definitions are reused.
+
         Args:
             file_path (str): Path to the file to analyze
+            max_tokens (int): Estimated token budget per request
+            max_workers (int): Number of chunks analyzed concurrently
+            incremental (bool): Reuse results for unchanged definitions
 
         Returns:
-            dict: Analysis results for the entire file
+            dict: Analysis results for the entire file, with line numbers in file coordinates
         """
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 code = file.read()
-            return self.analyze_code(code)
         except FileNotFoundError:
             return {"error": f"File not found: {file_path}"}
         except Exception as e:
             return {"error": f"Error reading file: {str(e)}"}
 
-    def batch_analyze(self, code_snippets):
+        if incremental:
+            result = self.incremental.analyze_file(file_path, code, max_tokens)
+            if result is not None:
+                return result
+
+        chunks = chunk_source(code, detect_language(file_path), max_tokens)
+        if len(chunks) <= 1:
+            return self.analyze_code(code)
+
+        # Chunks begin with the blank lines before their first definition; drop them so the
+        # model's line numbers count from the definition that start_line now points at
+        chunks = [chunk.strip_leading_blank_lines() for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = list(executor.map(lambda chunk: self._analyze_indexed(0, chunk.text), chunks))
+        return self._merge_chunk_results(chunks, results)
+
+    def _merge_chunk_results(self, chunks, results):
+        bugs = []
+        errors = []
+        weighted_score = 0
+        scored_lines = 0
+        for chunk, result in zip(chunks, results):
+            if 'error' in result:
+                errors.append(f"Lines {chunk.start_line}-{chunk.end_line}: {result['error']}")
+                continue
+            for bug in result.get('bugs', []):
+                bug = dict(bug)
+                if isinstance(bug.get('line_number'), int):
+                    bug['line_number'] += chunk.start_line - 1
+                bugs.append(bug)
+            lines = chunk.end_line - chunk.start_line + 1
+            weighted_score += result.get('overall_score', 0) * lines
+            scored_lines += lines
+
+        bugs.sort(key=lambda bug: bug['line_number'] if isinstance(bug.get('line_number'), int) else 0)
+        merged = {
+            "has_bugs": bool(bugs),
+            "bugs": bugs,
+            "overall_score": round(weighted_score / scored_lines) if scored_lines else 0,
+            "chunks_analyzed": len(chunks)
+        }
+        if errors:
+            merged["chunk_errors"] = errors
+            if len(errors) == len(chunks):
+                merged["error"] = errors[0]
+        return merged
+
+    def batch_analyze(self, code_snippets, max_workers=1):
         """
         Analyze multiple code snippets at once.
 
         Args:
             code_snippets (list): List of code snippets to analyze
+            max_workers (int): Number of snippets analyzed concurrently
 
         Returns:
-            list: Analysis results for each snippet
+            list: Analysis results for each snippet, in input order
         """
-        results = []
-        for i, snippet in enumerate(code_snippets):
-            result = self.analyze_code(snippet)
-            result['snippet_index'] = i
-            results.append(result)
+        if max_workers <= 1:
+            return [self._analyze_indexed(i, snippet) for i, snippet in enumerate(code_snippets)]
+
+        results = [None] * len(code_snippets)
+        for result in self.iter_batch_analyze(code_snippets, max_workers):
+            results[result['snippet_index']] = result
         return results
 
-# Example usage
-if __name__ == "__main__":
-    detector = BugDetector()
+    def iter_batch_analyze(self, code_snippets, max_workers=4):
+        """
+        Analyze multiple code snippets concurrently, yielding results as they finish.
 
+        Args:
+            code_snippets (list): List of code snippets to analyze
+            max_workers (int): Number of snippets analyzed concurrently
+
+        Yields:
+            dict: Analysis result for one snippet, tagged with 'snippet_index'
+        """
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(self._analyze_indexed, i, snippet)
+                for i, snippet in enumerate(code_snippets)
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Drop queued work if the caller stops consuming early
+                for future in futures:
+                    future.cancel()
+
+    def _analyze_indexed(self, index, snippet):
+        try:
+            result = self.analyze_code(snippet)
+        except Exception as e:
+            result = {
+                "error": f"Error analyzing code: {str(e)}",
+                "has_bugs": False,
+                "bugs": [],
+                "overall_score": 0
+            }
+        result['snippet_index'] = index
+        return result
+
+
+# Example usage
+def run_example(detector):
+    """
+    Analyze a small built-in sample and print the results.
+    """
     # Example code with potential bugs
     sample_code = """
     def calculate_average(numbers):
@@ -137,4 +269,208 @@ if __name__ == "__main__":
     print(f"Has bugs: {result['has_bugs']}")
     print(f"Overall score: {result['overall_score']}")
     for bug in result['bugs']:
-        print(f"- {bug['type']}: {bug['description']} (Line {bug['line_number']})")
\ No newline at end of file
+        print(f"- {bug['type']}: {bug['description']} (Line {bug['line_number']})")
+
+
+def run_scan(detector, args):
+    """
+    Scan a directory tree and stream one JSONL record per file to args.output.
+    """
+    extensions = None
+    if args.ext:
+        extensions = {ext if ext.startswith('.') else '.' + ext for ext in args.ext.split(',')}
+    scanner = RepositoryScanner(
+        lambda path: detector.predict_bugs_in_file(path, incremental=args.incremental),
+        max_workers=args.workers,
+        extensions=extensions,
+        max_file_bytes=args.max_file_size
+    )
+    summary = scanner.scan(args.root, args.output, args.checkpoint, resume=not args.no_resume)
+    print(json.dumps(summary, indent=2))
+    if summary["stopped"] == "quota_exhausted":
+        print("API quota exhausted; re-run the same command later to resume the scan.")
+
+
+def run_diff(detector, args):
+    """
+    Analyze only the functions and classes changed between two git revisions.
+    """
+    analyzer = DiffAnalyzer(lambda code: detector._analyze_indexed(0, code), max_workers=args.workers)
+    report = analyzer.analyze(args.repo, args.base, args.head)
+    print(json.dumps(report, indent=2))
+    if args.fail_on_bugs:
+        if report.get("has_bugs"):
+            raise SystemExit(1)
+        # A gate must not pass when part of the change was never analyzed
+        if "error" in report or report.get("regions_failed"):
+            raise SystemExit(2)
+
+
+def run_triage(args):
+    """
+    Train or evaluate the local triage model on a buggy/fixed dataset.
+    """
+    from bug_detector.triage import TriageModel
+
+    collector = DataCollector()
+    buggy_codes, fixed_codes = collector.get_training_data(collector.iter_local_dataset(args.dataset))
+    if not buggy_codes:
+        print(f"No training pairs found in {args.dataset}")
+        raise SystemExit(1)
+
+    if args.action == "train":
+        # Hold out the last pairs so the printed metrics are not measured on training data
+        held_out = int(len(buggy_codes) * args.holdout)
+        split = len(buggy_codes) - held_out
+        model = TriageModel()
+        model.train(buggy_codes[:split], fixed_codes[:split])
+        model.save(args.model)
+        print(f"Trained on {split} pairs; model saved to {args.model}")
+        if not held_out:
+            return
+        buggy_codes, fixed_codes = buggy_codes[split:], fixed_codes[split:]
+    else:
+        model = TriageModel.load(args.model)
+
+    metrics = model.evaluate(buggy_codes, fixed_codes, args.threshold)
+    print(f"Evaluated on {len(buggy_codes)} pairs at threshold {args.threshold}")
+    print(json.dumps(metrics, indent=2))
+
+
+def measure_import_time(module):
+    """
+    Import module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): The module to import, e.g. "app"
+
+    Returns:
+        dict: Total wall time and per-module (self, cumulative) microseconds, or an error
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"}
+
+    modules = []
+    direct = []
+    children = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two spaces per level and printed before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = {"module": name.strip(), "depth": depth,
+                 "self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+        modules.append(entry)
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            if entry["module"] == module:
+                direct = children
+            children = []
+    total_us = sum(entry["cumulative_us"] for entry in modules if entry["depth"] == 0)
+    return {"module": module, "total_ms": total_us / 1000, "direct_imports": direct, "modules": modules}
+
+
+def run_import_time(args):
+    """
+    Report what importing a module costs and optionally track it in a JSONL history file.
+    """
+    report = measure_import_time(args.module)
+    if "error" in report:
+        print(f"Could not import {args.module}: {report['error']}")
+        raise SystemExit(1)
+
+    print(f"Importing {args.module} took {report['total_ms']:.1f} ms")
+    print(f"Slowest imports made by {args.module} (cumulative):")
+    direct = sorted(report["direct_imports"], key=lambda entry: -entry["cumulative_us"])[:args.top]
+    for entry in direct:
+        print(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+    print("Slowest individual modules (self):")
+    for entry in sorted(report["modules"], key=lambda entry: -entry["self_us"])[:args.top]:
+        print(f"  {entry['self_us'] / 1000:8.1f} ms  {entry['module']}")
+
+    if not args.history:
+        return
+    previous = None
+    if os.path.exists(args.history):
+        with open(args.history, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry.get("module") == args.module:
+                        previous = entry
+    if previous is not None:
+        change = report["total_ms"] - previous["total_ms"]
+        print(f"Change since {previous['timestamp']}: {change:+.1f} ms")
+    with open(args.history, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "module": args.module,
+            "total_ms": report["total_ms"],
+            "top": [[entry["module"], entry["cumulative_us"]] for entry in direct]
+        }) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI-driven bug detection")
+    subparsers = parser.add_subparsers(dest="command")
+
+    scan_parser = subparsers.add_parser("scan", help="Analyze every source file in a directory tree")
+    scan_parser.add_argument("root", help="Directory to scan")
+    scan_parser.add_argument("--output", default="scan_results.jsonl", help="JSONL file to write results to")
+    scan_parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    scan_parser.add_argument("--workers", type=int, default=4, help="Files analyzed concurrently")
+    scan_parser.add_argument("--ext", help="Comma-separated extensions to include, e.g. py,js")
+    scan_parser.add_argument("--max-file-size", type=int, default=1024 * 1024,
+                             help="Skip files larger than this many bytes")
+    scan_parser.add_argument("--incremental", action="store_true",
+                             help="Only re-analyze definitions changed since the previous scan")
+    scan_parser.add_argument("--no-resume", action="store_true",
+                             help="Start from scratch instead of resuming from the checkpoint")
+
+    diff_parser = subparsers.add_parser("diff", help="Analyze only code changed between two git revisions")
+    diff_parser.add_argument("base", help="Base revision, e.g. origin/main")
+    diff_parser.add_argument("head", nargs="?", default="HEAD", help="New revision (default: HEAD)")
+    diff_parser.add_argument("--repo", default=".", help="Path to the git repository")
+    diff_parser.add_argument("--workers", type=int, default=4, help="Regions analyzed concurrently")
+    diff_parser.add_argument("--fail-on-bugs", action="store_true", help="Exit with status 1 if bugs are found, 2 if part of the diff could not be analyzed")
+
+    triage_parser = subparsers.add_parser("triage", help="Train or evaluate the local triage model")
+    triage_parser.add_argument("action", choices=["train", "evaluate"])
+    triage_parser.add_argument("dataset", help="JSON or JSONL file of buggy/fixed code pairs")
+    triage_parser.add_argument("--model", default="triage_model.pkl", help="Where the model is saved or loaded")
+    triage_parser.add_argument("--holdout", type=float, default=0.2,
+                               help="Fraction of pairs held out for evaluation when training")
+    triage_parser.add_argument("--threshold", type=float, default=0.5,
+                               help="Probability above which a snippet counts as having issues")
+
+    import_parser = subparsers.add_parser("import-time", help="Report the start-up import cost of a module")
+    import_parser.add_argument("module", nargs="?", default="app", help="Module to import (default: app)")
+    import_parser.add_argument("--top", type=int, default=10, help="Number of modules to list")
+    import_parser.add_argument("--history", help="JSONL file to append the measurement to")
+
+    args = parser.parse_args(argv)
+    load_environment()
+    if args.command == "import-time":
+        run_import_time(args)
+        return
+    if args.command == "triage":
+        run_triage(args)
+        return
+
+    detector = BugDetector()
+    if args.command == "scan":
+        run_scan(detector, args)
+    elif args.command == "diff":
+        run_diff(detector, args)
+    else:
+        run_example(detector)
+
+
+if __name__ == "__main__":
+    main()